@@ -0,0 +1,158 @@
+import sys
+sys.path.append('src')
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import letterboxd_api as letterboxd
+import metrics
+import poster_output
+
+import generate_poster as poster
+import render_budget
+from image_cache import get_image_cache
+
+
+
+def read_usernames(source):
+    lines = sys.stdin if source == '-' else open(source)
+    try:
+        for line in lines:
+            username = line.strip()
+            if username and not username.startswith('#'):
+                yield username
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+def fetch_user(access_token, username):
+    client = letterboxd.get_client(access_token)
+    user_id = client.get_user_id(username)
+    try:
+        total_watch_time, total_watch_time_this_year = client.sync_watch_time(user_id)
+        profile_picture_url = client.get_profile_picture(user_id, poster.layout_size('avatar'))
+        favorite_posters = client.get_favorite_posters(user_id, poster.layout_size('favorites'))
+        image_cache = get_image_cache()
+        return {
+            'profile': metrics.metrics.enabled,
+            'username': username,
+            'user_id': user_id,
+            'display_name': client.get_display_name(user_id),
+            'profile_picture_url': profile_picture_url,
+            'watches': client.get_watches(user_id),
+            'watches_this_year': client.get_diary_entries_this_year(user_id),
+            'total_watch_time': total_watch_time,
+            'total_watch_time_this_year': total_watch_time_this_year,
+            'favorite_posters': favorite_posters,
+            'histogram': client.get_histogram(user_id),
+            'profile_picture_data': image_cache.fetch(profile_picture_url),
+            'favorite_posters_data': [image_cache.fetch(url) for url in favorite_posters]
+        }
+    finally:
+        client.forget(user_id)
+
+
+def render_user(job):
+    if job['profile']:
+        metrics.enable()
+        metrics.metrics.reset()
+    poster.draw_poster(job['username'], job['user_id'], job['display_name'], job['profile_picture_url'], job['watches'], job['watches_this_year'],
+                       job['total_watch_time'], job['total_watch_time_this_year'], job['favorite_posters'], job['histogram'],
+                       favorite_posters_data=job['favorite_posters_data'] or None, profile_picture_data=job['profile_picture_data'], output=job['output'])
+    written = [path for paths in poster_output.get_encoder().wait() for path in paths]
+    return ', '.join(written), metrics.metrics.snapshot() if job['profile'] else None
+
+
+def run_batch(usernames, config_file="config.ini", io_workers=8, render_workers=None, queue_size=None, render_memory=None, output=None):
+    render_workers = render_workers or os.cpu_count() or 1
+    if render_memory:
+        render_workers = max(1, min(render_workers, render_memory // render_budget.estimate_render_bytes()))
+    queue_size = queue_size or render_workers * 2
+    access_token = letterboxd.get_access_token(config_file)
+    slots = threading.BoundedSemaphore(queue_size)
+    report = []
+    report_lock = threading.Lock()
+    finished = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=io_workers) as io_pool, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=render_workers, mp_context=multiprocessing.get_context('spawn')) as render_pool:
+
+        def finish(username, started, done, error=None, filename=None):
+            with report_lock:
+                report.append({
+                    'username': username,
+                    'status': 'failed' if error else 'ok',
+                    'error': str(error) if error else None,
+                    'file': filename,
+                    'seconds': round(time.perf_counter() - started, 3)
+                })
+            slots.release()
+            done.set_result(None)
+
+        def rendered(username, started, done, future):
+            try:
+                filename, profile = future.result()
+                if profile:
+                    metrics.metrics.merge(profile)
+                finish(username, started, done, filename=filename)
+            except Exception as e:
+                finish(username, started, done, error=e)
+
+        def fetched(username, started, done, future):
+            try:
+                job = future.result()
+                job['output'] = output
+                render_pool.submit(render_user, job).add_done_callback(lambda future: rendered(username, started, done, future))
+            except Exception as e:
+                finish(username, started, done, error=e)
+
+        for username in usernames:
+            slots.acquire()
+            started = time.perf_counter()
+            done = concurrent.futures.Future()
+            finished.append(done)
+            io_pool.submit(fetch_user, access_token, username).add_done_callback(
+                lambda future, username=username, started=started, done=done: fetched(username, started, done, future)
+            )
+        concurrent.futures.wait(finished)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate posters for many Letterboxd usernames.")
+    parser.add_argument("usernames", help="file with one username per line, or - to read from stdin")
+    parser.add_argument("--config", default="config.ini")
+    parser.add_argument("--io-workers", type=int, default=8, help="users fetched from the API at once")
+    parser.add_argument("--render-workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--render-memory-mb", type=int, default=None, help="memory all render processes may use at once; caps --render-workers")
+    parser.add_argument("--queue-size", type=int, default=None, help="users in flight at once (default: twice the render workers)")
+    parser.add_argument("--report", default="batch_report.json", help="where to write the per-user report")
+    metrics.add_arguments(parser)
+    poster_output.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.configure(args)
+
+    report = run_batch(read_usernames(args.usernames), args.config, args.io_workers, args.render_workers, args.queue_size,
+                       args.render_memory_mb * 2**20 if args.render_memory_mb else None, poster_output.from_args(args))
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.profile:
+        metrics.metrics.write(args.profile, args.profile_format)
+    failed = [entry for entry in report if entry['status'] != 'ok']
+    print(f"Generated {len(report) - len(failed)} posters, {len(failed)} failed. Report written to {args.report}.")
+    for entry in failed:
+        print(f"  {entry['username']}: {entry['error']}")
+    if failed:
+        sys.exit(1)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'src')]
+import argparse
+import json
+import logging
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+import requests
+
+from fake_letterboxd import serve, synthetic_jpeg
+
+DEFAULT_FILMS = (10, 1000, 5000)
+BASELINE_PATH = os.path.join(ROOT, 'bench', 'baseline.json')
+TOLERANCE = 0.25
+COMPARED = ('seconds', 'requests', 'peak_rss_mb')
+
+
+def peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def make_workspace():
+    workspace = tempfile.mkdtemp(prefix='posterboxd-bench-')
+    for name in ('fonts', 'images'):
+        os.symlink(os.path.join(ROOT, name), os.path.join(workspace, name))
+    with open(os.path.join(workspace, 'config.ini'), 'w') as f:
+        f.write("[Letterboxd API Token]\nCLIENT_ID: bench\nCLIENT_SECRET: bench\n")
+    os.chdir(workspace)
+    return workspace
+
+
+def server_stats(api_url):
+    if not api_url:
+        return {}
+    return requests.get(f"{api_url}/_stats").json()
+
+
+def summarize(runs):
+    summary = dict(runs[0])
+    if len(runs) > 1:
+        summary['seconds'] = round(statistics.median(run['seconds'] for run in runs), 3)
+        summary['requests'] = statistics.median(run['requests'] for run in runs)
+        summary['rate_limited'] = statistics.median(run['rate_limited'] for run in runs)
+        summary['stages'] = {name: round(statistics.median(run['stages'].get(name, 0) for run in runs), 3) for name in runs[0]['stages']}
+    summary['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+    return summary
+
+
+def measure(run, api_url=None):
+    import metrics
+    metrics.metrics.reset()
+    before = server_stats(api_url)
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+    after = server_stats(api_url)
+    spans = metrics.metrics.snapshot()['spans']
+    return {
+        'seconds': round(seconds, 3),
+        'requests': sum(after.values()) - sum(before.values()),
+        'rate_limited': after.get('429', 0) - before.get('429', 0),
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': {name: round(span['seconds'], 3) for name, span in sorted(spans.items()) if name.startswith(('stage.', 'render.', 'encode.'))}
+    }
+
+
+def run_pipeline(films, api_url, repeat):
+    import letterboxd_api as letterboxd
+    import metrics
+    from main import build_pipeline
+    from poster_output import get_encoder
+    letterboxd.API_URL = f"{api_url}/api/v0"
+    letterboxd.TOKEN_URL = f"{letterboxd.API_URL}/auth/token"
+    metrics.enable()
+
+    username = f"films{films}"
+    runs = []
+    for _ in range(repeat):
+        pipeline = build_pipeline(username)
+
+        def run():
+            pipeline.run()
+            get_encoder().wait()
+
+        runs.append(measure(run, api_url))
+        letterboxd.get_client(pipeline.results['access_token']).forget(pipeline.results['user_id'])
+    return {
+        f"pipeline_{username}_cold": runs[0],
+        f"pipeline_{username}_warm": summarize(runs[1:]) if repeat > 1 else None
+    }
+
+
+def run_draw_poster(repeat):
+    import generate_poster as poster
+    import metrics
+    from poster_output import get_encoder
+    metrics.enable()
+
+    favorite_posters_data = [synthetic_jpeg(f"poster/{film}", 2000, 3000) for film in range(4)]
+    profile_picture_data = synthetic_jpeg("avatar", 1000, 1000)
+    histogram = [{'rating': rating / 2, 'count': rating * 10} for rating in range(1, 11)]
+
+    def draw():
+        poster.draw_poster("bench", "M0", "Synthetic User", None, "1,000", "200", "1,900", "380", [], histogram,
+                           favorite_posters_data=favorite_posters_data, profile_picture_data=profile_picture_data)
+        get_encoder().wait()
+
+    runs = [measure(draw) for _ in range(repeat)]
+    return {
+        'draw_poster_cold': runs[0],
+        'draw_poster_warm': summarize(runs[1:]) if repeat > 1 else None
+    }
+
+
+def run_child(args):
+    workspace = make_workspace()
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        if args.child == 'pipeline':
+            results = run_pipeline(args.films[0], args.api_url, args.repeat)
+        else:
+            results = run_draw_poster(args.repeat)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workspace, ignore_errors=True)
+    print(json.dumps({name: result for name, result in results.items() if result is not None}))
+
+
+def run_scenario(args, api_url, child, films=None):
+    command = [sys.executable, os.path.abspath(__file__), '--child', child, '--repeat', str(args.repeat)]
+    if films is not None:
+        command += ['--films', str(films), '--api-url', api_url]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        print(completed.stderr)
+        raise Exception(f"Benchmark {child} {films or ''} failed with exit code {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for key in COMPARED:
+            before, after = baseline[name].get(key), result.get(key)
+            if before and after is not None and after > before * (1 + tolerance):
+                regressions.append(f"{name} {key}: {before} -> {after} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'scenario':<34}{'seconds':>10}{'requests':>10}{'429s':>8}{'peak MB':>10}")
+    for name, result in results.items():
+        print(f"{name:<34}{result['seconds']:>10.3f}{result['requests']:>10}{result['rate_limited']:>8}{result['peak_rss_mb']:>10.1f}")
+        slowest = sorted(result['stages'].items(), key=lambda stage: -stage[1])[:4]
+        print("    " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in slowest))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark poster generation against a local fake Letterboxd API.")
+    parser.add_argument("--films", type=int, nargs='+', default=list(DEFAULT_FILMS), help="synthetic user sizes to run (10 to 20000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the first is reported as cold, the median of the rest as warm")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the fake API adds to every response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of API requests answered with 429")
+    parser.add_argument("--list-runtimes", action="store_true", help="include runTime in the fake API's film lists")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown before a result counts as a regression")
+    parser.add_argument("--output", default=None, help="also write the results to this file")
+    parser.add_argument("--child", choices=('pipeline', 'draw_poster'), help=argparse.SUPPRESS)
+    parser.add_argument("--api-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    server = serve(latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit, list_runtimes=args.list_runtimes)
+    results = {}
+    try:
+        for films in args.films:
+            print(f"Running pipeline for a user with {films} films...")
+            results.update(run_scenario(args, server.url, 'pipeline', films))
+        print("Running draw_poster...")
+        results.update(run_scenario(args, server.url, 'draw_poster'))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}.")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}.")
+    else:
+        print(f"No baseline at {args.baseline}, so nothing was compared. Run with --save-baseline to store one.")
+
+
+
+if __name__ == "__main__":
+    main()
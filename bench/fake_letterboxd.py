@@ -0,0 +1,258 @@
+import argparse
+import collections
+import hashlib
+import http.server
+import io
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+from PIL import Image, ImageDraw
+
+API_PREFIX = '/api/v0'
+USERNAME_PATTERN = re.compile(r'^films(\d+)$')
+MIN_FILMS = 10
+MAX_FILMS = 20000
+AVATAR_SIZES = (80, 144, 300, 1000)
+POSTER_SIZES = ((230, 345), (1000, 1500), (2000, 3000))
+FAVORITES = 4
+
+
+def user_films(username):
+    match = USERNAME_PATTERN.match(username.lower())
+    if not match:
+        return None
+    return max(MIN_FILMS, min(MAX_FILMS, int(match.group(1))))
+
+
+def film_runtime(film):
+    return 80 + film * 37 % 90
+
+
+def color_for(key):
+    digest = hashlib.sha256(key.encode()).digest()
+    return digest[0], digest[1], digest[2]
+
+
+def synthetic_jpeg(key, width, height):
+    image = Image.new('RGB', (width, height), color_for(key))
+    draw = ImageDraw.Draw(image)
+    for i in range(8):
+        top = height * i // 8
+        draw.rectangle([0, top, width, top + height // 16], fill=color_for(f"{key}/{i}"))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+class FakeLetterboxd(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, rate_limit=0.0, retry_after=1, list_runtimes=False, max_age=86400):
+        super().__init__(address, FakeLetterboxdHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.list_runtimes = list_runtimes
+        self.max_age = max_age
+        self.stats = collections.Counter()
+        self.images = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_port}"
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def should_rate_limit(self):
+        with self._lock:
+            return self.rate_limit and self._random.random() < self.rate_limit
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self._lock:
+                jitter = self._random.uniform(0, self.jitter)
+            time.sleep(self.latency + jitter)
+
+    def image(self, path, key, size):
+        with self._lock:
+            if path in self.images:
+                return self.images[path]
+        data = synthetic_jpeg(key, *size)
+        with self._lock:
+            self.images[path] = data
+        return data
+
+    def film_summary(self, film):
+        summary = {'id': f"F{film}", 'name': f"Film {film}", 'releaseYear': 1950 + film % 75}
+        if self.list_runtimes:
+            summary['runTime'] = film_runtime(film)
+        return summary
+
+    def member(self, films):
+        avatar = [{'width': size, 'height': size, 'url': f"{self.url}/images/avatar/{films}/{size}.jpg"} for size in AVATAR_SIZES]
+        favorites = []
+        for film in range(FAVORITES):
+            sizes = [{'width': width, 'height': height, 'url': f"{self.url}/images/poster/{film}/{width}x{height}.jpg"} for width, height in POSTER_SIZES]
+            favorites.append(dict(self.film_summary(film), poster={'sizes': sizes}))
+        return {'id': f"M{films}", 'username': f"films{films}", 'displayName': f"Synthetic {films}",
+                'avatar': {'sizes': avatar}, 'favoriteFilms': favorites}
+
+    def statistics(self, films):
+        ratings = [{'rating': rating / 2, 'count': films * rating // 55} for rating in range(1, 11)]
+        return {'counts': {'watches': films, 'diaryEntriesThisYear': max(1, films // 5)}, 'ratingsHistogram': ratings}
+
+    def films(self, films, cursor, per_page):
+        start = int(cursor.split('=')[1]) if cursor else 0
+        page = {'items': [self.film_summary(film) for film in range(start, min(start + per_page, films))]}
+        if start + per_page < films:
+            page['next'] = f"start={start + per_page}"
+        return page
+
+    def log_entries(self, films, cursor, per_page):
+        entries = max(1, films // 5)
+        start = int(cursor.split('=')[1]) if cursor else 0
+        items = [{'id': f"L{films}x{entry}", 'film': self.film_summary(entry * 7 % films)} for entry in range(start, min(start + per_page, entries))]
+        page = {'items': items}
+        if start + per_page < entries:
+            page['next'] = f"start={start + per_page}"
+        return page
+
+
+class FakeLetterboxdHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, document, status=200, headers=None):
+        self._send(status, json.dumps(document).encode(), headers=headers)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != f"{API_PREFIX}/auth/token":
+            self._json({'error': 'not found'}, 404)
+            return
+        self.server.count('auth/token')
+        self._json({'access_token': 'fake-token', 'token_type': 'bearer', 'expires_in': 3600})
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+        if url.path == '/_stats':
+            self._json(dict(self.server.stats))
+            return
+        if url.path.startswith('/images/'):
+            self._get_image(url.path)
+            return
+        if not url.path.startswith(API_PREFIX):
+            self._json({'error': 'not found'}, 404)
+            return
+
+        path = url.path[len(API_PREFIX):]
+        self.server.delay()
+        if self.server.should_rate_limit():
+            self.server.count('429')
+            self._json({'error': 'rate limited'}, 429, {'Retry-After': str(self.server.retry_after)})
+            return
+        self._get_api(path, query)
+
+    def _get_api(self, path, query):
+        per_page = int(query.get('perPage', 20))
+        parts = path.strip('/').split('/')
+        self.server.count(parts[0] if parts[0] != 'member' or len(parts) < 3 else 'member/statistics')
+
+        if parts == ['search']:
+            films = user_films(query.get('input', ''))
+            items = [{'type': 'MemberSearchItem', 'member': {'id': f"M{films}", 'username': query['input']}}] if films else []
+            self._json({'items': items})
+        elif parts[0] == 'member' and len(parts) >= 2 and parts[1].startswith('M'):
+            films = user_films(f"films{parts[1][1:]}")
+            if films is None:
+                self._json({'error': 'unknown member'}, 404)
+            elif len(parts) == 2:
+                self._json(self.server.member(films))
+            else:
+                self._json(self.server.statistics(films))
+        elif parts == ['films']:
+            films = user_films(f"films{query.get('member', '')[1:]}")
+            self._json(self.server.films(films or 0, query.get('cursor'), per_page))
+        elif parts == ['log-entries']:
+            films = user_films(f"films{query.get('member', '')[1:]}")
+            self._json(self.server.log_entries(films or 0, query.get('cursor'), per_page))
+        elif parts[0] == 'film' and len(parts) == 2 and parts[1][1:].isdigit():
+            film = int(parts[1][1:])
+            self._json(dict(self.server.film_summary(film), runTime=film_runtime(film)))
+        else:
+            self._json({'error': 'not found'}, 404)
+
+    def _get_image(self, path):
+        self.server.count('images')
+        parts = path.strip('/').split('/')
+        try:
+            if parts[1] == 'avatar':
+                size = int(parts[3].split('.')[0])
+                data = self.server.image(path, f"avatar/{parts[2]}", (size, size))
+            else:
+                width, height = (int(value) for value in parts[3].split('.')[0].split('x'))
+                data = self.server.image(path, f"poster/{parts[2]}", (width, height))
+        except (IndexError, ValueError):
+            self._json({'error': 'not found'}, 404)
+            return
+        etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+        headers = {'ETag': etag, 'Cache-Control': f"max-age={self.server.max_age}"}
+        if self.headers.get('If-None-Match') == etag:
+            self.server.count('images/304')
+            self._send(304, b'', 'image/jpeg', headers)
+            return
+        self._send(200, data, 'image/jpeg', headers)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host='127.0.0.1', port=0, **options):
+    server = FakeLetterboxd((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Letterboxd API with synthetic users.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every API response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds, at random")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of API requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with each 429")
+    parser.add_argument("--list-runtimes", action="store_true", help="include runTime in film lists")
+    args = parser.parse_args()
+
+    server = FakeLetterboxd((args.host, args.port), latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+                            retry_after=args.retry_after, list_runtimes=args.list_runtimes)
+    print(f"Fake Letterboxd API on {server.url}{API_PREFIX} (users: films{MIN_FILMS} to films{MAX_FILMS})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,62 @@
 import sys
 sys.path.append('src')
+import argparse
+
 import letterboxd_api as letterboxd
+import metrics
+import poster_output
 
 import generate_poster as poster
+from pipeline import Pipeline
+
+
+
+POSTER_INPUTS = ("user_id", "display_name", "profile_picture_url", "watches", "watches_this_year", "watch_time", "favorite_posters", "histogram", "favorite_posters_data", "profile_picture_data")
+
 
+def draw(username, results, scale=poster.RENDER_SCALE, save=True, output=None):
+    total_watch_time, total_watch_time_this_year = results['watch_time']
+    return poster.draw_poster(username, results['user_id'], results['display_name'], results['profile_picture_url'], results['watches'], results['watches_this_year'], total_watch_time, total_watch_time_this_year, results['favorite_posters'], results['histogram'],
+                              favorite_posters_data=results['favorite_posters_data'], profile_picture_data=results['profile_picture_data'], scale=scale, save=save, output=output)
+
+
+def build_pipeline(username, config_file="config.ini", access_token=None, scale=poster.RENDER_SCALE, save=True, output=None, render=True):
+    pipeline = Pipeline()
+    pipeline.add("access_token", lambda: access_token or letterboxd.get_access_token(config_file))
+    pipeline.add("user_id", lambda access_token: letterboxd.get_user_id(access_token, username), "access_token")
+    pipeline.add("display_name", letterboxd.get_display_name, "access_token", "user_id")
+    pipeline.add("profile_picture_url", lambda access_token, user_id: letterboxd.get_profile_picture(access_token, user_id, poster.layout_size('avatar', scale)), "access_token", "user_id")
+    pipeline.add("watches", letterboxd.get_watches, "access_token", "user_id")
+    pipeline.add("watches_this_year", letterboxd.get_diary_entries_this_year, "access_token", "user_id")
+    pipeline.add("watch_time", letterboxd.sync_watch_time, "access_token", "user_id")
+    pipeline.add("favorite_posters", lambda access_token, user_id: letterboxd.get_favorite_posters(access_token, user_id, poster.layout_size('favorites', scale)), "access_token", "user_id")
+    pipeline.add("histogram", letterboxd.get_histogram, "access_token", "user_id")
+    pipeline.add("profile_picture_data", poster.load_image_data, "profile_picture_url")
+    pipeline.add("favorite_posters_data", poster.load_favorite_posters_data, "favorite_posters")
+    if render:
+        pipeline.add("poster", lambda *inputs: draw(username, dict(zip(POSTER_INPUTS, inputs)), scale, save, output), *POSTER_INPUTS)
+    return pipeline
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate a poster for a Letterboxd user.")
+    metrics.add_arguments(parser)
+    poster_output.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.configure(args)
+
     username = input("what is your Letterboxd username?: ")
 
-    access_token = letterboxd.get_access_token("config.ini")
-    user_id = letterboxd.get_user_id(access_token, username)
-    display_name = letterboxd.get_display_name(access_token, user_id)
-    profile_picture_url = letterboxd.get_profile_picture(access_token, user_id)
-    watches = letterboxd.get_watches(access_token, user_id)
-    watches_this_year = letterboxd.get_diary_entries_this_year(access_token, user_id)
-    total_watch_time = letterboxd.get_total_watch_time(access_token, letterboxd.get_list_of_watches(access_token, user_id))
-    total_watch_time_this_year = letterboxd.get_total_watch_time(access_token, letterboxd.get_list_of_watches_this_year(access_token, user_id))
-    favorite_posters = letterboxd.get_favorite_posters(access_token, user_id)
-    histogram = letterboxd.get_histogram(access_token, user_id)
-    poster.draw_poster(username, user_id, display_name, profile_picture_url, watches, watches_this_year, total_watch_time, total_watch_time_this_year, favorite_posters, histogram)
-    
+    pipeline = build_pipeline(username, output=poster_output.from_args(args))
+    pipeline.run()
+    pipeline.report()
+    for paths in poster_output.get_encoder().wait():
+        print(f"Saved {', '.join(paths)}.")
+    if args.profile:
+        metrics.metrics.write(args.profile, args.profile_format)
+        print(f"Profile written to {args.profile}.")
+
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,233 @@
+import sys
+sys.path.append('src')
+import argparse
+import collections
+import concurrent.futures
+import http.server
+import logging
+import re
+import threading
+import time
+import urllib.parse
+
+import letterboxd_api as letterboxd
+import metrics
+import poster_output
+import render_budget
+
+import generate_poster as poster
+from assets import get_font, get_static_overlay
+from image_cache import get_image_cache
+from layout import FONTS, POSTER_LAYOUT
+from main import build_pipeline, draw
+
+POSTER_PATH = re.compile(r'^/poster/([A-Za-z0-9_-]+)\.(png|jpg|webp)$')
+EXTENSION_FORMATS = {'png': 'png', 'jpg': 'jpeg', 'webp': 'webp'}
+FRESHNESS = 15 * 60
+CACHE_BUDGET = 64 * 1024 * 1024
+MAX_SCALE = 4
+
+logger = logging.getLogger(__name__)
+
+
+class PosterService:
+    def __init__(self, config_file="config.ini", freshness=FRESHNESS, cache_budget=CACHE_BUDGET, render_workers=2, output=None):
+        self.config_file = config_file
+        self.output = output or poster_output.PosterOutput()
+        self.freshness = freshness
+        self.cache_budget = cache_budget
+        self.stats = collections.Counter()
+        self._renders = threading.BoundedSemaphore(render_workers)
+        self._cache = collections.OrderedDict()
+        self._cache_size = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def access_token(self):
+        return letterboxd.get_access_token(self.config_file)
+
+    def warm(self, scales=(poster.RENDER_SCALE,)):
+        letterboxd.get_client(self.access_token())
+        get_image_cache()
+        for scale in scales:
+            for name in FONTS:
+                get_font(name, scale)
+            get_static_overlay(POSTER_LAYOUT, scale)
+
+    def _recall(self, key):
+        with self._lock:
+            if key in self._cache:
+                image, rendered_at = self._cache[key]
+                if time.time() - rendered_at < self.freshness:
+                    self._cache.move_to_end(key)
+                    return image
+                self._cache_size -= len(self._cache.pop(key)[0])
+        return None
+
+    def _remember(self, key, image):
+        with self._lock:
+            if key in self._cache:
+                self._cache_size -= len(self._cache.pop(key)[0])
+            self._cache[key] = (image, time.time())
+            self._cache_size += len(image)
+            while self._cache_size > self.cache_budget and len(self._cache) > 1:
+                _, (evicted, _) = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+    def _render(self, username, scale, output, width):
+        # Only drawing waits for a render slot; the API and download stages run unthrottled.
+        pipeline = build_pipeline(username, self.config_file, access_token=self.access_token(), scale=scale, save=False, render=False)
+        try:
+            results = pipeline.run()
+        finally:
+            if 'user_id' in pipeline.results:
+                letterboxd.get_client(self.access_token()).forget(pipeline.results['user_id'])
+        with self._renders:
+            image = draw(username, results, scale, save=False)
+        return poster_output.encode(image, output=output, width=width)
+
+    def get_poster(self, username, scale=poster.RENDER_SCALE, format=None, width=None):
+        output = poster_output.PosterOutput(format or self.output.format, self.output.quality, self.output.compress_level)
+        key = (username.lower(), id(POSTER_LAYOUT), scale, output.format, width)
+        image = self._recall(key)
+        if image is not None:
+            self.stats['hit'] += 1
+            metrics.count('server.hits')
+            return image, 'hit'
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+        if not owner:
+            self.stats['coalesced'] += 1
+            metrics.count('server.coalesced')
+            return future.result(), 'coalesced'
+
+        self.stats['miss'] += 1
+        metrics.count('server.misses')
+        try:
+            image = self._recall(key) or self._render(username, scale, output, width)
+            self._remember(key, image)
+            future.set_result(image)
+        except Exception as e:
+            self.stats['failed'] += 1
+            metrics.count('server.failures')
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return image, 'miss'
+
+
+class PosterRequestHandler(http.server.BaseHTTPRequestHandler):
+    service = None
+
+    def _send(self, status, body, content_type='text/plain; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == '/health':
+            self._send(200, b'ok')
+            return
+        if url.path == '/metrics' and metrics.metrics.enabled:
+            self._send(200, metrics.metrics.to_prometheus().encode(), 'text/plain; version=0.0.4')
+            return
+
+        match = POSTER_PATH.match(url.path)
+        if not match:
+            self._send(404, b'not found')
+            return
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            scale = int(query.get('scale', [poster.RENDER_SCALE])[0])
+        except ValueError:
+            scale = 0
+        if not 1 <= scale <= MAX_SCALE:
+            self._send(400, f"scale must be between 1 and {MAX_SCALE}".encode())
+            return
+        try:
+            width = int(query['width'][0]) if 'width' in query else None
+        except ValueError:
+            width = 0
+        if width is not None and width < 1:
+            self._send(400, b"width must be a positive number of pixels")
+            return
+
+        format = EXTENSION_FORMATS[match.group(2)]
+        started = time.perf_counter()
+        try:
+            image, source = self.service.get_poster(match.group(1), scale, format, width)
+        except letterboxd.UserNotFound as e:
+            self._send(404, str(e).encode())
+            return
+        except Exception as e:
+            logger.error(f"Failed to render poster for {match.group(1)}: {e}")
+            self._send(502, str(e).encode())
+            return
+        self._send(200, image, poster_output.FORMATS[format][2], {
+            'X-Cache': source,
+            'X-Render-Seconds': f"{time.perf_counter() - started:.3f}",
+            'Cache-Control': f"max-age={self.service.freshness}"
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(service, host='127.0.0.1', port=8000):
+    handler = type('Handler', (PosterRequestHandler,), {'service': service})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Letterboxd posters over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--config", default="config.ini")
+    parser.add_argument("--api-url", default=None, help="Letterboxd API base URL, e.g. a local stand-in for testing")
+    parser.add_argument("--freshness", type=int, default=FRESHNESS, help="seconds a rendered poster is served from cache")
+    parser.add_argument("--cache-mb", type=int, default=CACHE_BUDGET // (1024 * 1024), help="memory for rendered posters")
+    parser.add_argument("--render-workers", type=int, default=2, help="posters rendered at once")
+    parser.add_argument("--render-memory-mb", type=int, default=None, help="memory renders may use at once; renders wait for room")
+    metrics.add_arguments(parser)
+    poster_output.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.configure(args)
+
+    if args.api_url:
+        letterboxd.API_URL = args.api_url.rstrip('/')
+        letterboxd.TOKEN_URL = f"{letterboxd.API_URL}/auth/token"
+
+    if args.render_memory_mb:
+        render_budget.set_render_budget(args.render_memory_mb * 2**20)
+    service = PosterService(args.config, args.freshness, args.cache_mb * 1024 * 1024, args.render_workers, poster_output.from_args(args))
+    service.warm()
+    server = serve(service, args.host, args.port)
+    print(f"Serving posters on http://{args.host}:{server.server_port}/poster/<username>{service.output.extension}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {dict(service.stats)}")
+        if args.profile:
+            metrics.metrics.write(args.profile, args.profile_format)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import functools
+import threading
+
+from PIL import Image, ImageDraw, ImageFont
+
+from layout import FONTS, scaled
+
+STATIC_ELEMENTS = ('image',)
+
+_measure_draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+_overlays = {}
+_overlays_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(name, scale):
+    path, size = FONTS[name]
+    try:
+        return ImageFont.truetype(path, scaled(size, scale))
+    except IOError:
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=4096)
+def measure_text(text, font_name, scale):
+    return _measure_draw.textbbox((0, 0), text, font=get_font(font_name, scale))
+
+
+@functools.lru_cache(maxsize=None)
+def get_static_image(source, size):
+    return Image.open(source).convert('RGBA').resize(size)
+
+
+@functools.lru_cache(maxsize=256)
+def get_text_sprite(text, font_name, scale, color):
+    bbox = measure_text(text, font_name, scale)
+    sprite = Image.new('RGBA', (max(1, bbox[2]), max(1, bbox[3])), color[:3] + (0,))
+    ImageDraw.Draw(sprite).text((0, 0), text, font=get_font(font_name, scale), fill=color)
+    return sprite
+
+
+def get_static_overlay(layout, scale):
+    key = (id(layout), scale)
+    with _overlays_lock:
+        if key in _overlays:
+            return _overlays[key]
+    boxes = []
+    for element in layout:
+        if element['element'] in STATIC_ELEMENTS:
+            x, y = scaled(element['anchor'], scale)
+            width, height = scaled(element['size'], scale)
+            boxes.append((element, (x, y, x + width, y + height)))
+    if not boxes:
+        overlay = None
+    else:
+        left = min(box[0] for _, box in boxes)
+        top = min(box[1] for _, box in boxes)
+        right = max(box[2] for _, box in boxes)
+        bottom = max(box[3] for _, box in boxes)
+        image = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+        for element, box in boxes:
+            image.alpha_composite(get_static_image(element['source'], scaled(element['size'], scale)), (box[0] - left, box[1] - top))
+        overlay = (image, (left, top))
+    with _overlays_lock:
+        _overlays[key] = overlay
+    return overlay
@@ -0,0 +1,60 @@
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+PROXY_SCALE = 16
+BAND_TOP = 4 * 1400
+BAND_COLOR = (20, 24, 28)
+
+
+def create_initial_gradient(width, height, colors, band_top=BAND_TOP):
+    gradient = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(gradient)
+    for i, color in enumerate(colors):
+        if i == 0:
+            draw.rectangle([0, 0, width//2, height//2], fill=color)
+        elif i == 1:
+            draw.rectangle([width//2, 0, width, height//2], fill=color)
+        elif i == 2:
+            draw.rectangle([0, height//2, width//2, height], fill=color)
+        elif i == 3:
+            draw.rectangle([width//2, height//2, width, height], fill=color)
+
+    draw.rectangle([0, band_top, width, height], fill=BAND_COLOR)
+    return gradient
+
+
+def create_reference_background(width, height, colors, radius, band_top=BAND_TOP):
+    return create_initial_gradient(width, height, colors, band_top).filter(ImageFilter.GaussianBlur(radius=radius))
+
+
+def create_blurred_background(width, height, colors, radius, band_top=BAND_TOP, scale=PROXY_SCALE):
+    proxy_size = (max(1, round(width / scale)), max(1, round(height / scale)))
+    proxy = create_initial_gradient(proxy_size[0], proxy_size[1], colors, round(band_top * proxy_size[1] / height))
+    proxy = proxy.filter(ImageFilter.GaussianBlur(radius=radius * proxy_size[1] / height))
+    return proxy.resize((width, height), Image.Resampling.BILINEAR)
+
+
+def compare_backgrounds(width, height, colors, radius, band_top=BAND_TOP, scale=PROXY_SCALE):
+    started = time.perf_counter()
+    reference = create_reference_background(width, height, colors, radius, band_top)
+    reference_time = time.perf_counter() - started
+    started = time.perf_counter()
+    fast = create_blurred_background(width, height, colors, radius, band_top, scale)
+    fast_time = time.perf_counter() - started
+
+    import numpy as np
+    difference = np.abs(np.asarray(reference, dtype=np.int16) - np.asarray(fast, dtype=np.int16))
+    return {
+        'max_difference': int(difference.max()),
+        'mean_difference': float(difference.mean()),
+        'reference_seconds': reference_time,
+        'fast_seconds': fast_time
+    }
+
+
+if __name__ == "__main__":
+    colors = [(200, 40, 40), (30, 160, 60), (40, 60, 210), (230, 210, 40)]
+    result = compare_backgrounds(1080 * 4, 1920 * 4, colors, 200 * 4)
+    print(f"Max difference: {result['max_difference']}, mean difference: {result['mean_difference']:.3f}")
+    print(f"Reference blur: {result['reference_seconds']:.2f}s, proxy blur: {result['fast_seconds']:.2f}s")
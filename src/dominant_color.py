@@ -0,0 +1,68 @@
+THUMBNAIL_SIZE = (100, 100)
+
+
+def thumbnail_pixels(image, size=THUMBNAIL_SIZE):
+    import numpy as np
+    image = image.convert("RGB")
+    if image.size != size:
+        image = image.resize(size, reducing_gap=3.0)
+    return np.asarray(image, dtype=np.uint8).reshape((-1, 3))
+
+
+def mean_color(pixels):
+    return tuple(map(int, pixels.mean(axis=0)))
+
+
+def mode_color(pixels, bins=8):
+    import numpy as np
+    step = 256 // bins
+    quantized = pixels // step
+    keys = (quantized[:, 0].astype(np.int32) * bins + quantized[:, 1]) * bins + quantized[:, 2]
+    counts = np.bincount(keys, minlength=bins ** 3)
+    return mean_color(pixels[keys == counts.argmax()])
+
+
+def median_cut(pixels, k=4):
+    import numpy as np
+    boxes = [pixels]
+    while len(boxes) < k:
+        ranges = [np.ptp(box, axis=0) if len(box) > 1 else np.zeros(3) for box in boxes]
+        index = max(range(len(boxes)), key=lambda i: ranges[i].max())
+        if ranges[index].max() == 0:
+            break
+        box = boxes.pop(index)
+        box = box[box[:, ranges[index].argmax()].argsort(kind='stable')]
+        middle = len(box) // 2
+        boxes.extend([box[:middle], box[middle:]])
+    boxes.sort(key=len, reverse=True)
+    return [mean_color(box) for box in boxes]
+
+
+def median_cut_color(pixels, k=4):
+    return median_cut(pixels, k)[0]
+
+
+def kmeans_color(pixels, k=1):
+    import numpy as np
+    from sklearn.cluster import KMeans
+    kmeans = KMeans(n_clusters=k)
+    labels = kmeans.fit_predict(pixels)
+    return tuple(map(int, kmeans.cluster_centers_[np.bincount(labels).argmax()]))
+
+
+METHODS = {
+    'mean': mean_color,
+    'mode': mode_color,
+    'median_cut': median_cut_color,
+    'kmeans': kmeans_color
+}
+
+
+def get_dominant_color(image, method='mean', **options):
+    if method not in METHODS:
+        raise Exception(f"Unknown dominant color method: {method}")
+    return METHODS[method](thumbnail_pixels(image), **options)
+
+
+def get_palette(image, k=4):
+    return median_cut(thumbnail_pixels(image), k)
@@ -1,238 +1,233 @@
-import numpy as np
-from sklearn.cluster import KMeans
-from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageFilter
-import requests
+from PIL import Image, ImageDraw, ImageOps
+import concurrent.futures
+import functools
+import metrics
+import render_budget
+from poster_output import PosterOutput, get_encoder, save_poster
+from image_cache import decode_image, get_image_cache
+from dominant_color import THUMBNAIL_SIZE, get_dominant_color
+from background import create_blurred_background
+from layout import POSTER_LAYOUT, RENDER_SCALE, scaled
+from assets import STATIC_ELEMENTS, get_font, get_static_overlay, get_text_sprite, measure_text
+
+BLANK_FAVORITE = "images/blankfavorite.png"
+
+def layout_size(element_name, scale=RENDER_SCALE, layout=POSTER_LAYOUT):
+    element = next(element for element in layout if element['element'] == element_name)
+    return scaled(element['size'], scale)
+
+def load_image_data(source):
+    return get_image_cache().read(source)
+
+def load_favorite_posters_data(favorite_posters):
+    if not favorite_posters:
+        favorite_posters = [BLANK_FAVORITE, BLANK_FAVORITE, BLANK_FAVORITE, BLANK_FAVORITE]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(favorite_posters)) as executor:
+        return list(executor.map(load_image_data, favorite_posters))
+
+def decode_images(images_data, size=None):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(images_data)) as executor:
+        return list(executor.map(lambda data: decode_image(data, size), images_data))
 
 def convert_to_jpg(image):
     rgb_image = image.convert('RGB')
     return rgb_image 
-def get_most_prominent_color(image):
-    image = image.convert("RGB")
-    image = image.resize((100, 100))
-    image = np.array(image).reshape((-1, 3))
-    kmeans = KMeans(n_clusters=1)
-    kmeans.fit(image)
-    return tuple(map(int, kmeans.cluster_centers_[0]))
-
-def create_initial_gradient(width, height, colors):
-    gradient = Image.new('RGB', (width, height))
-    draw = ImageDraw.Draw(gradient)
-    for i, color in enumerate(colors):
-        if i == 0:
-            draw.rectangle([0, 0, width//2, height//2], fill=color)
-        elif i == 1:
-            draw.rectangle([width//2, 0, width, height//2], fill=color)
-        elif i == 2:
-            draw.rectangle([0, height//2, width//2, height], fill=color)
-        elif i == 3:
-            draw.rectangle([width//2, height//2, width, height], fill=color)
-    
-    draw.rectangle([0, 4*1400, width, height], fill=(20, 24, 28))
-    return gradient
+def get_most_prominent_color(image, method='mean'):
+    with metrics.span('render.color'):
+        return get_dominant_color(image, method)
+
+@functools.lru_cache(maxsize=16)
+def rounded_corner_mask(size, radius):
+    # Only the corners need supersampling, so each one is drawn at 4x in its own
+    # tile using the full rectangle's coordinates and downsampled in place.
+    width, height = size
+    corner = min(radius + 8, width, height)
+    mask = Image.new('L', size, 255)
+    for x in (0, width - corner):
+        for y in (0, height - corner):
+            tile = Image.new('L', (corner * 4, corner * 4), 0)
+            ImageDraw.Draw(tile).rounded_rectangle((-x * 4, -y * 4, (width - x) * 4, (height - y) * 4), radius=radius * 4, fill=255)
+            mask.paste(tile.resize((corner, corner), Image.Resampling.LANCZOS), (x, y))
+    return mask
+
+@functools.lru_cache(maxsize=16)
+def circle_mask(size):
+    mask = Image.new('L', size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0) + size, fill=255)
+    return mask
 
 def add_rounded_corners(image, radius):
-    big_size = (image.size[0] * 4, image.size[1] * 4)
-    mask = Image.new('L', big_size, 0)
-    draw = ImageDraw.Draw(mask)
-    draw.rounded_rectangle((0, 0) + big_size, radius=radius * 4, fill=255)
-    mask = mask.resize(image.size, Image.Resampling.LANCZOS)
     rounded_image = image.copy()
-    rounded_image.putalpha(mask)
+    rounded_image.putalpha(rounded_corner_mask(image.size, radius))
     return rounded_image
 
 def make_circle(image):
-    size = image.size
-    mask = Image.new('L', size, 0)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((0, 0) + size, fill=255)
     circle_image = image.copy()
-    circle_image.putalpha(mask)
+    circle_image.putalpha(circle_mask(image.size))
     return circle_image
 
 def draw_rectangle(image, x, y, width, height, color):
     draw = ImageDraw.Draw(image)
     draw.rectangle([x, y, x + width, y + height], fill=color)
 
-def draw_histogram_rectangles(image, anchor_rect_x, anchor_rect_y, anchor_rect_width, anchor_rect_height, rating_data, gap=8):
+def draw_histogram_rectangles(image, anchor_rect_x, anchor_rect_y, anchor_rect_width, anchor_rect_height, rating_data, gap=8, max_height=100 * 4, color=(68, 85, 102, 255)):
     draw = ImageDraw.Draw(image)
     num_rectangles = len(rating_data)
     rect_width = (anchor_rect_width - (num_rectangles - 1) * gap) // num_rectangles
     max_count = max(item['count'] for item in rating_data) 
 
-    scaling_factor = (100 * 4) / max_count 
+    scaling_factor = max_height / max_count 
 
     for i, item in enumerate(rating_data):
         x = anchor_rect_x + i * (rect_width + gap)
         height = item['count'] * scaling_factor
         y = anchor_rect_y - height
-        draw.rectangle([x, y, x + rect_width, anchor_rect_y], fill=(68, 85, 102, 255))
-
-
-def draw_poster(username, user_id, display_name, profile_picture_url, watches, watches_this_year, total_watch_time, total_watch_time_this_year, favorite_posters, histogram):
-    width, height = 1080 * 4, 1920 * 4
-    background_color = (255, 255, 255)
-    poster = Image.new("RGB", (width, height), background_color)
+        draw.rectangle([x, y, x + rect_width, anchor_rect_y], fill=color)
+
+def create_background(size, element, context, scale):
+    width, height = size
+    return create_blurred_background(width, height, context['dominant_colors'], scaled(element['blur_radius'], scale), scaled(element['band_top'], scale))
+
+def draw_background(poster, element, context, scale):
+    poster.paste(create_background(poster.size, element, context, scale), (0, 0))
+
+def draw_favorites(poster, element, context, scale):
+    grid_size = scaled(element['size'], scale)
+    mask = rounded_corner_mask(grid_size, scaled(element['corner_radius'], scale))
+    favorite_images = context.pop('favorite_images')
+    for i in range(len(favorite_images)):
+        fav_image = favorite_images[i]
+        favorite_images[i] = None
+        fav_poster = fav_image if fav_image.size == grid_size and fav_image.mode == 'RGB' else fav_image.resize(grid_size)
+        del fav_image
+        poster.paste(fav_poster, scaled(element['anchors'][i], scale), mask)
+        del fav_poster
+
+def draw_avatar(poster, element, context, scale):
+    profile_picture = convert_to_jpg(context.pop('profile_image').resize(scaled(element['size'], scale)))
+    profile_picture_position = scaled(element['anchor'], scale)
+    poster.paste(profile_picture, profile_picture_position, circle_mask(profile_picture.size))
+    context['avatar_box'] = profile_picture_position + profile_picture.size
+
+def draw_display_name(poster, element, context, scale):
     draw = ImageDraw.Draw(poster)
+    font = get_font(element['font'], scale)
+    display_name = context['display_name']
+    max_length = element['max_length']
+    if len(display_name) > max_length:
+        display_name = display_name[:max_length - 3] + "..."
 
-    try:
-        font = ImageFont.truetype("fonts/GraphikSemibold.otf", 60 * 4)
-    except IOError:
-        font = ImageFont.load_default()
-
-
-    response = requests.get(profile_picture_url, stream=True)
-    profile_picture = Image.open(response.raw).resize((200 * 4, 200 * 4))
-    profile_picture = convert_to_jpg(profile_picture)
-
-
-    profile_picture_position = (27 * 4, 1580 * 4)
-
-    if not favorite_posters:
-        favorite_posters = ["images/blankfavorite.png", "images/blankfavorite.png", "images/blankfavorite.png", "images/blankfavorite.png"]
+    avatar_x, avatar_y, avatar_width, avatar_height = context['avatar_box']
+    profile_center_x = avatar_x + avatar_width // 2
+    text_bbox = measure_text(display_name, element['font'], scale)
+    text_x_position = profile_center_x + avatar_width // 2 + scaled(element['offset'], scale)
+    text_y_position = avatar_y + avatar_height // 2 - text_bbox[3] // 2
+    draw.text((text_x_position, text_y_position), display_name, font=font, fill=element['color'])
 
-    dominant_colors = []
-    for source in favorite_posters:
-        if source.startswith('http'):
-            response = requests.get(source, stream=True)
-            fav_poster = Image.open(response.raw).resize((500 * 4, 750 * 4))
+def draw_stats(poster, element, context, scale):
+    draw = ImageDraw.Draw(poster)
+    value_font = get_font(element['value_font'], scale)
+    rect_x, rect_y = scaled(element['anchor'], scale)
+    rect_width, rect_height = scaled(element['divider'], scale)
+    gap = scaled(element['gap'], scale)
+    middle_y = rect_y + rect_height // 2
+    draw_rectangle(poster, rect_x, rect_y, rect_width, rect_height, element['color'])
+
+    for i, (value_name, labels) in enumerate(element['columns']):
+        value_text = str(context[value_name])
+        value_bbox = measure_text(value_text, element['value_font'], scale)
+        value_width = value_bbox[2] - value_bbox[0]
+        if i == 0:
+            value_x = rect_x - gap - value_width
         else:
-            fav_poster = Image.open(source).resize((500 * 4, 750 * 4))
-        dominant_colors.append(get_most_prominent_color(fav_poster))
-
-    initial_gradient = create_initial_gradient(width, height, dominant_colors)
-    blurred_gradient = initial_gradient.filter(ImageFilter.GaussianBlur(radius=200 * 4))
-    poster.paste(blurred_gradient, (0, 0))
-
-    grid_positions = [(27 * 4, 27 * 4), (553 * 4, 27 * 4), (27 * 4, 803 * 4), (553 * 4, 803 * 4)]
-    grid_size = (500 * 4, 750 * 4)
-
-    for i, source in enumerate(favorite_posters):
-        if source.startswith('http'):
-            response = requests.get(source, stream=True)
-            fav_poster = Image.open(response.raw).resize(grid_size)
+            value_x = rect_x + gap + rect_width
+        value_y = middle_y - value_bbox[3] // 2 + scaled(element['value_offset'], scale)
+        draw.text((value_x, value_y), value_text, font=value_font, fill=element['value_color'])
+
+        for label, offset in zip(labels, element['label_offsets']):
+            label_bbox = measure_text(label, element['label_font'], scale)
+            label_x = value_x + (value_width - (label_bbox[2] - label_bbox[0])) // 2
+            label_y = middle_y - label_bbox[3] // 2 + scaled(offset, scale)
+            label_sprite = get_text_sprite(label, element['label_font'], scale, element['label_color'])
+            poster.paste(label_sprite, (label_x, label_y), label_sprite)
+
+        if 0 < i < len(element['columns']) - 1:
+            rect_x = value_x + value_width + gap
+            draw_rectangle(poster, rect_x, rect_y, rect_width, rect_height, element['color'])
+
+def draw_histogram(poster, element, context, scale):
+    histrect_x, histrect_y = scaled(element['anchor'], scale)
+    histrect_width, histrect_height = scaled(element['size'], scale)
+    draw_histogram_rectangles(poster, histrect_x, histrect_y, histrect_width, histrect_height, context['histogram'], gap=scaled(element['gap'], scale), max_height=histrect_height, color=element['color'])
+
+def draw_static_overlay(poster, layout, scale):
+    overlay = get_static_overlay(layout, scale)
+    if overlay is not None:
+        image, position = overlay
+        poster.paste(image, position, image)
+
+ELEMENT_RENDERERS = {
+    'background': draw_background,
+    'favorites': draw_favorites,
+    'avatar': draw_avatar,
+    'display_name': draw_display_name,
+    'stats': draw_stats,
+    'histogram': draw_histogram
+}
+
+def render_poster(context, scale=RENDER_SCALE, layout=POSTER_LAYOUT):
+    canvas = layout[0]
+    size = scaled(canvas['size'], scale)
+    elements = layout[1:]
+    if elements and elements[0]['element'] == 'background':
+        # The blurred background covers the whole canvas, so it becomes the canvas.
+        with metrics.span('render.background'):
+            poster = create_background(size, elements[0], context, scale)
+        elements = elements[1:]
+    else:
+        poster = Image.new("RGB", size, canvas['color'])
+    overlay_drawn = False
+    for element in elements:
+        if element['element'] in STATIC_ELEMENTS:
+            if not overlay_drawn:
+                with metrics.span('render.overlay'):
+                    draw_static_overlay(poster, layout, scale)
+                overlay_drawn = True
         else:
-            fav_poster = Image.open(source).resize(grid_size)
-        fav_poster_rounded = add_rounded_corners(fav_poster, 5 * 4)
-        poster.paste(fav_poster_rounded, grid_positions[i], fav_poster_rounded)
-
-    profile_picture_circle = make_circle(profile_picture)
-    poster.paste(profile_picture_circle, profile_picture_position, profile_picture_circle)
-
-    profile_center_x = profile_picture_position[0] + profile_picture.size[0] // 2
-    max_length = 12
-
-    if len(display_name) > max_length:
-        display_name = display_name[:max_length - 3] + "..."
-
-    text_bbox = draw.textbbox((0, 0), display_name, font=font)
-    text_x_position = profile_center_x + profile_picture.size[0] // 2 + 40
-    text_y_position = profile_picture_position[1] + profile_picture.size[1] // 2 - text_bbox[3] // 2
-
-    draw.text((text_x_position, text_y_position), display_name, font=font, fill=(216, 224, 232, 255))
-
-    rect_x, rect_y = 405 * 4, 1780 * 4
-    rect_width, rect_height = 1 * 4, 100 * 4
-    rect_color = (68,85,102,255)
-    draw_rectangle(poster, rect_x, rect_y, rect_width, rect_height, rect_color)
-
-    watches_text = str(watches)
-    watches_font = ImageFont.truetype("fonts/TiemposTextSemibold.ttf", int(40 * 4 * 1.1))
-    watches_text_bbox = draw.textbbox((0, 0), watches_text, font=watches_font)
-    watches_text_x_position = rect_x - 45 * 4 - (watches_text_bbox[2] - watches_text_bbox[0])
-    watches_text_y_position = rect_y + rect_height // 2 - watches_text_bbox[3] // 2 - 20 * 4
-    draw.text((watches_text_x_position, watches_text_y_position), watches_text, font=watches_font, fill=(216, 224, 232, 255))
-
-    films_text = "FILMS"
-    films_font = ImageFont.truetype("fonts/GraphikRegular.otf", int(40 * 2))
-    films_text_bbox = draw.textbbox((0, 0), films_text, font=films_font)
-    films_text_x_position = watches_text_x_position + ((watches_text_bbox[2] - watches_text_bbox[0]) - (films_text_bbox[2] - films_text_bbox[0])) // 2
-    films_text_y_position = rect_y + rect_height // 2 - films_text_bbox[3] // 2 + 20 * 4
-    draw.text((films_text_x_position, films_text_y_position), films_text, font=films_font, fill=(100, 119, 135, 255))
-
-    watches_this_year_text = str(watches_this_year)
-    watches_this_year_font = ImageFont.truetype("fonts/TiemposTextSemibold.ttf", int(40 * 4 * 1.1))
-    watches_this_year_text_bbox = draw.textbbox((0, 0), watches_this_year_text, font=watches_this_year_font)
-    watches_this_year_text_x_position = rect_x + 45 * 4 + rect_width
-    watches_this_year_text_y_position = rect_y + rect_height // 2 - watches_this_year_text_bbox[3] // 2 - 20 * 4
-    draw.text((watches_this_year_text_x_position, watches_this_year_text_y_position), watches_this_year_text, font=watches_this_year_font, fill=(216, 224, 232, 255))
-
-    this_year_text = "THIS YEAR"
-    this_year_font = ImageFont.truetype("fonts/GraphikRegular.otf", int(40 * 2))
-    this_year_text_bbox = draw.textbbox((0, 0), this_year_text, font=this_year_font)
-    this_year_text_x_position = watches_this_year_text_x_position + ((watches_this_year_text_bbox[2] - watches_this_year_text_bbox[0]) - (this_year_text_bbox[2] - this_year_text_bbox[0])) // 2
-    this_year_text_y_position = rect_y + rect_height // 2 - this_year_text_bbox[3] // 2 + 20 * 4
-    draw.text((this_year_text_x_position, this_year_text_y_position), this_year_text, font=this_year_font, fill=(100, 119, 135, 255))
-
-    new_rect_x = watches_this_year_text_x_position + (watches_this_year_text_bbox[2] - watches_this_year_text_bbox[0]) + 45 * 4
-    new_rect_y = rect_y
-    new_rect_width = 1 * 4
-    new_rect_height = 100 * 4
-    draw_rectangle(poster, new_rect_x, new_rect_y, new_rect_width, new_rect_height, rect_color)
-
-    total_watch_time_text = str(total_watch_time)
-    total_watch_time_font = ImageFont.truetype("fonts/TiemposTextSemibold.ttf", int(40 * 4 * 1.1))
-    total_watch_time_text_bbox = draw.textbbox((0, 0), total_watch_time_text, font=total_watch_time_font)
-    total_watch_time_text_x_position = new_rect_x + 45 * 4 + new_rect_width
-    total_watch_time_text_y_position = rect_y + rect_height // 2 - total_watch_time_text_bbox[3] // 2 - 20 * 4
-    draw.text((total_watch_time_text_x_position, total_watch_time_text_y_position), total_watch_time_text, font=total_watch_time_font, fill=(216, 224, 232, 255))
-
-    hours_text = "HOURS"
-    hours_font = ImageFont.truetype("fonts/GraphikRegular.otf", int(40 * 2))
-    hours_text_bbox = draw.textbbox((0, 0), hours_text, font=hours_font)
-    hours_text_x_position = total_watch_time_text_x_position + ((total_watch_time_text_bbox[2] - total_watch_time_text_bbox[0]) - (hours_text_bbox[2] - hours_text_bbox[0])) // 2
-    hours_text_y_position = rect_y + rect_height // 2 - hours_text_bbox[3] // 2 + 20 * 4
-    draw.text((hours_text_x_position, hours_text_y_position), hours_text, font=hours_font, fill=(100, 119, 135, 255))
-
-    hours_text = "WATCHED"
-    hours_font = ImageFont.truetype("fonts/GraphikRegular.otf", int(40 * 2))
-    hours_text_bbox = draw.textbbox((0, 0), hours_text, font=hours_font)
-    hours_text_x_position = total_watch_time_text_x_position + ((total_watch_time_text_bbox[2] - total_watch_time_text_bbox[0]) - (hours_text_bbox[2] - hours_text_bbox[0])) // 2
-    hours_text_y_position = rect_y + rect_height // 2 - hours_text_bbox[3] // 2 + 45 * 4
-    draw.text((hours_text_x_position, hours_text_y_position), hours_text, font=hours_font, fill=(100, 119, 135, 255))
-
-    final_rect_x = total_watch_time_text_x_position + (total_watch_time_text_bbox[2] - total_watch_time_text_bbox[0]) + 45 * 4
-    final_rect_y = rect_y
-    final_rect_width = 1 * 4
-    final_rect_height = 100 * 4
-    draw_rectangle(poster, final_rect_x, final_rect_y, final_rect_width, final_rect_height, rect_color)
-
-    total_watch_time_this_year_text = str(total_watch_time_this_year)
-    total_watch_time_this_year_font = ImageFont.truetype("fonts/TiemposTextSemibold.ttf", int(40 * 4 * 1.1))
-    total_watch_time_this_year_text_bbox = draw.textbbox((0, 0), total_watch_time_this_year_text, font=total_watch_time_this_year_font)
-    total_watch_time_this_year_text_x_position = final_rect_x + 45 * 4 + final_rect_width
-    total_watch_time_this_year_text_y_position = rect_y + rect_height // 2 - total_watch_time_this_year_text_bbox[3] // 2 - 20 * 4
-    draw.text((total_watch_time_this_year_text_x_position, total_watch_time_this_year_text_y_position), total_watch_time_this_year_text, font=total_watch_time_this_year_font, fill=(216, 224, 232, 255))
-
-    hours_this_year_text = "HOURS"
-    hours_this_year_font = ImageFont.truetype("fonts/GraphikRegular.otf", int(40 * 2))
-    hours_this_year_text_bbox = draw.textbbox((0, 0), hours_this_year_text, font=hours_this_year_font)
-    hours_this_year_text_x_position = total_watch_time_this_year_text_x_position + ((total_watch_time_this_year_text_bbox[2] - total_watch_time_this_year_text_bbox[0]) - (hours_this_year_text_bbox[2] - hours_this_year_text_bbox[0])) // 2
-    hours_this_year_text_y_position = rect_y + rect_height // 2 - hours_this_year_text_bbox[3] // 2 + 20 * 4
-    draw.text((hours_this_year_text_x_position, hours_this_year_text_y_position), hours_this_year_text, font=hours_this_year_font, fill=(100, 119, 135, 255))
-
-    hours_this_year_text = "THIS YEAR"
-    hours_this_year_font = ImageFont.truetype("fonts/GraphikRegular.otf", int(40 * 2))
-    hours_this_year_text_bbox = draw.textbbox((0, 0), hours_this_year_text, font=hours_this_year_font)
-    hours_this_year_text_x_position = total_watch_time_this_year_text_x_position + ((total_watch_time_this_year_text_bbox[2] - total_watch_time_this_year_text_bbox[0]) - (hours_this_year_text_bbox[2] - hours_this_year_text_bbox[0])) // 2
-    hours_this_year_text_y_position = rect_y + rect_height // 2 - hours_this_year_text_bbox[3] // 2 + 45 * 4
-    draw.text((hours_this_year_text_x_position, hours_this_year_text_y_position), hours_this_year_text, font=hours_this_year_font, fill=(100, 119, 135, 255))
-
-
-
-
-    histrect_x, histrect_y = 606 * 4, 1730 * 4
-    histrect_width, histrect_height = 405 * 4, 1 * 4
-    histrect_color = (68, 85, 102, 255)
-
-    draw_histogram_rectangles(poster, histrect_x, histrect_y, histrect_width, histrect_height, histogram)
-
-    one_star = Image.open("images/onestar.png").resize((23 * 4, 23 * 4))
-    one_star_position = (606 * 4, 1736 * 4)
-    poster.paste(one_star, one_star_position, one_star)
-
-    one_star = Image.open("images/fivestar.png").resize((126 * 4, 23 * 4))
-    one_star_position = (885 * 4, 1736 * 4)
-    poster.paste(one_star, one_star_position, one_star)
-
-    filename = f"poster_{username}.png"
-    poster.save(filename)
+            with metrics.span(f"render.{element['element']}"):
+                ELEMENT_RENDERERS[element['element']](poster, element, context, scale)
+    return poster
+
+
+def draw_poster(username, user_id, display_name, profile_picture_url, watches, watches_this_year, total_watch_time, total_watch_time_this_year, favorite_posters, histogram, favorite_posters_data=None, profile_picture_data=None, scale=RENDER_SCALE, save=True, output=None, target=None):
+    if profile_picture_data is None:
+        profile_picture_data = load_image_data(profile_picture_url)
+    if favorite_posters_data is None:
+        favorite_posters_data = load_favorite_posters_data(favorite_posters)
+
+    # Inputs arrive encoded and are decoded only once the render budget has room for them.
+    with render_budget.reserve(render_budget.estimate_render_bytes(scale)):
+        with metrics.span('render.decode'):
+            profile_image = decode_image(profile_picture_data, layout_size('avatar', scale))
+            favorite_images = decode_images(favorite_posters_data, layout_size('favorites', scale))
+        context = {
+            'display_name': display_name,
+            'watches': watches,
+            'watches_this_year': watches_this_year,
+            'total_watch_time': total_watch_time,
+            'total_watch_time_this_year': total_watch_time_this_year,
+            'histogram': histogram,
+            'profile_image': profile_image,
+            'favorite_images': favorite_images,
+            # A separate reduced decode, so JPEG posters give up their colors at 1/8 scale.
+            'dominant_colors': [get_most_prominent_color(decode_image(data, THUMBNAIL_SIZE)) for data in favorite_posters_data]
+        }
+        del favorite_images, profile_image
+        poster = render_poster(context, scale)
+
+    if save:
+        output = output or PosterOutput()
+        target = target if target is not None else f"poster_{username}{output.extension}"
+        get_encoder().submit(save_poster, poster, target, output)
+    return poster
@@ -0,0 +1,158 @@
+import collections
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from PIL import Image
+
+import metrics
+
+IMAGE_CACHE_DIR = 'cache/images'
+# Only encoded bytes are kept in memory; decoded images belong to the render that
+# decoded them and count against its render budget.
+MEMORY_BUDGET = 64 * 1024 * 1024
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+
+def draft_image(image, size):
+    original_size = image.size
+    image.draft('RGB', size)
+    return image.size != original_size
+
+
+def decode_image(data, size=None):
+    image = Image.open(io.BytesIO(data))
+    if size is not None and draft_image(image, size):
+        metrics.count('image_cache.draft')
+    image.load()
+    return image
+
+
+class ImageCache:
+    def __init__(self, directory=IMAGE_CACHE_DIR, memory_budget=MEMORY_BUDGET, session=None):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.session = session if session is not None else requests.Session()
+        self.stats = collections.Counter()
+        self._memory = collections.OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _count(self, name, value=1):
+        self.stats[name] += value
+        metrics.count(f'image_cache.{name}', value)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, key), os.path.join(self.directory, key + '.json')
+
+    def _remember(self, source, data):
+        with self._lock:
+            if source in self._memory:
+                self._memory_size -= len(self._memory.pop(source))
+            self._memory[source] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_budget and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _recall(self, source):
+        with self._lock:
+            if source in self._memory:
+                self._memory.move_to_end(source)
+                return self._memory[source]
+        return None
+
+    def _write(self, path, data):
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+
+    def fetch(self, url):
+        if not self.directory:
+            with metrics.span('image.download'):
+                response = self.session.get(url)
+            response.raise_for_status()
+            self._count('downloaded')
+            self._count('bytes', len(response.content))
+            return response.content
+
+        body_path, meta_path = self._paths(url)
+        metadata = None
+        if os.path.exists(body_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                metadata = json.load(f)
+            if metadata.get('fresh_until', 0) > time.time():
+                self._count('disk')
+                with open(body_path, 'rb') as f:
+                    return f.read()
+
+        headers = {}
+        if metadata is not None:
+            if metadata.get('etag'):
+                headers['If-None-Match'] = metadata['etag']
+            if metadata.get('last_modified'):
+                headers['If-Modified-Since'] = metadata['last_modified']
+        with metrics.span('image.download'):
+            response = self.session.get(url, headers=headers)
+
+        if response.status_code == 304 and metadata is not None:
+            self._count('revalidated')
+            data = None
+        elif response.status_code == 200:
+            self._count('downloaded')
+            self._count('bytes', len(response.content))
+            data = response.content
+            self._write(body_path, data)
+            metadata = {}
+        else:
+            response.raise_for_status()
+            raise Exception(f"Failed to fetch image: {response.status_code} - {url}")
+
+        metadata['etag'] = response.headers.get('ETag', metadata.get('etag'))
+        metadata['last_modified'] = response.headers.get('Last-Modified', metadata.get('last_modified'))
+        max_age = MAX_AGE_PATTERN.search(response.headers.get('Cache-Control', ''))
+        metadata['fresh_until'] = time.time() + int(max_age.group(1)) if max_age else 0
+        self._write(meta_path, json.dumps(metadata).encode())
+
+        if data is None:
+            with open(body_path, 'rb') as f:
+                data = f.read()
+        return data
+
+    def read(self, source):
+        data = self._recall(source)
+        if data is not None:
+            self._count('memory')
+            return data
+        if source.startswith('http'):
+            data = self.fetch(source)
+        else:
+            with open(source, 'rb') as f:
+                data = f.read()
+        self._remember(source, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_image_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageCache()
+        return _default_cache
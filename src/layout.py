@@ -0,0 +1,37 @@
+RENDER_SCALE = 4
+
+TEXT_COLOR = (216, 224, 232, 255)
+LABEL_COLOR = (100, 119, 135, 255)
+DIVIDER_COLOR = (68, 85, 102, 255)
+
+FONTS = {
+    'display_name': ("fonts/GraphikSemibold.otf", 60),
+    'value': ("fonts/TiemposTextSemibold.ttf", 44),
+    'label': ("fonts/GraphikRegular.otf", 20)
+}
+
+POSTER_LAYOUT = [
+    {'element': 'canvas', 'size': (1080, 1920), 'color': (255, 255, 255)},
+    {'element': 'background', 'blur_radius': 200, 'band_top': 1400},
+    {'element': 'favorites', 'anchors': [(27, 27), (553, 27), (27, 803), (553, 803)], 'size': (500, 750), 'corner_radius': 5},
+    {'element': 'avatar', 'anchor': (27, 1580), 'size': (200, 200)},
+    {'element': 'display_name', 'font': 'display_name', 'color': TEXT_COLOR, 'offset': 10, 'max_length': 12},
+    {'element': 'stats', 'anchor': (405, 1780), 'divider': (1, 100), 'color': DIVIDER_COLOR, 'gap': 45,
+     'value_font': 'value', 'value_color': TEXT_COLOR, 'value_offset': -20,
+     'label_font': 'label', 'label_color': LABEL_COLOR, 'label_offsets': (20, 45),
+     'columns': [
+         ('watches', ("FILMS",)),
+         ('watches_this_year', ("THIS YEAR",)),
+         ('total_watch_time', ("HOURS", "WATCHED")),
+         ('total_watch_time_this_year', ("HOURS", "THIS YEAR"))
+     ]},
+    {'element': 'histogram', 'anchor': (606, 1730), 'size': (405, 100), 'gap': 2, 'color': DIVIDER_COLOR},
+    {'element': 'image', 'source': "images/onestar.png", 'anchor': (606, 1736), 'size': (23, 23)},
+    {'element': 'image', 'source': "images/fivestar.png", 'anchor': (885, 1736), 'size': (126, 23)}
+]
+
+
+def scaled(value, scale):
+    if isinstance(value, (tuple, list)):
+        return tuple(scaled(item, scale) for item in value)
+    return int(value * scale)
@@ -1,17 +1,51 @@
 import requests
+from requests.adapters import HTTPAdapter
+import collections
 import concurrent.futures
-from datetime import date
+import itertools
+import threading
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
 import configparser
+import logging
+import os
+import random
+import re
+import time
+import metrics
+from runtime_cache import get_runtime_cache
+from token_manager import TokenManager
+from user_snapshot import get_snapshot_store, new_snapshot
 
 TOKEN_URL = 'https://api.letterboxd.com/api/v0/auth/token'
+API_URL = 'https://api.letterboxd.com/api/v0'
+RUNTIME_WORKERS = 20
+PAGE_WORKERS = 8
+PAGE_WINDOW = PAGE_WORKERS * 2
+MAX_PENDING_RUNTIMES = RUNTIME_WORKERS * 4
+FILM_SUMMARY_FIELDS = ('name', 'releaseYear', 'runTime')
+PROFILE_PICTURE_SIZE = (800, 800)
+FAVORITE_POSTER_SIZE = (2000, 3000)
+CURSOR_PATTERN = re.compile(r'^start=(\d+)$')
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF = 0.5
+MAX_BACKOFF = 30
 
-def get_access_token(config_file):
-    print("Reading configuration file for client credentials...")
+logger = logging.getLogger(__name__)
+
+
+class UserNotFound(Exception):
+    pass
+
+
+def request_access_token(config_file):
+    logger.debug("Reading configuration file for client credentials...")
     config = configparser.ConfigParser()
     config.read(config_file)
     CLIENT_ID = config.get('Letterboxd API Token', 'CLIENT_ID')
     CLIENT_SECRET = config.get('Letterboxd API Token', 'CLIENT_SECRET')
-    print("Configuration read successfully.")
+    logger.debug("Configuration read successfully.")
 
     data = {
         'grant_type': 'client_credentials',
@@ -21,250 +55,547 @@ def get_access_token(config_file):
     headers = {
         'Content-Type': 'application/x-www-form-urlencoded'
     }
-    print("Requesting access token...")
+    logger.info("Requesting access token...")
     response = requests.post(TOKEN_URL, data=data, headers=headers)
     response_data = response.json()
     if 'access_token' in response_data:
-        print("Access token received.")
-        return response_data['access_token']
+        logger.info("Access token received.")
+        return response_data
     else:
         error_message = f"Error obtaining access token: {response_data}"
-        print(error_message)
+        logger.error(error_message)
         raise Exception(error_message)
 
-def get_user_id(access_token, username):
-    print(f"Fetching user ID for username: {username}...")
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    params = {
-        "input": username,
-        "include": "MemberSearchItem"
-    }
-    response = requests.get("https://api.letterboxd.com/api/v0/search", params=params, headers=headers)
-    if response.status_code == 200:
-        user_id = response.json()["items"][0]['member']["id"]
-        print(f"User ID for {username} is {user_id}.")
-        return user_id
-    else:
-        error_message = f"Failed to fetch user ID: {response.status_code} - {response.text}"
-        print(error_message)
-        raise Exception(error_message)
 
-def get_display_name(access_token, user_id):
-    print(f"Fetching display name for user ID: {user_id}...")
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    response = requests.get(f"https://api.letterboxd.com/api/v0/member/{user_id}", headers=headers)
-    if response.status_code == 200:
-        display_name = response.json()["displayName"]
-        print(f"Display name for user ID {user_id} is {display_name}.")
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+def get_token_manager(config_file):
+    key = os.path.abspath(config_file)
+    with _token_managers_lock:
+        if key not in _token_managers:
+            _token_managers[key] = TokenManager(lambda: request_access_token(config_file), key=key)
+        return _token_managers[key]
+
+def find_token_manager(access_token):
+    with _token_managers_lock:
+        for token_manager in _token_managers.values():
+            if access_token in token_manager.issued:
+                return token_manager
+    return None
+
+def get_access_token(config_file):
+    return get_token_manager(config_file).token()
+
+
+def pick_image_size(sizes, size):
+    width, height = size
+    covering = [image_size for image_size in sizes if image_size['width'] >= width and image_size['height'] >= height]
+    if covering:
+        return min(covering, key=lambda image_size: image_size['width'] * image_size['height'])['url']
+    if sizes:
+        return max(sizes, key=lambda image_size: image_size['width'] * image_size['height'])['url']
+    return None
+
+def parse_retry_after(value):
+    if value is None:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def film_entry(film):
+    entry = {'film': film.get('id')}
+    for field in FILM_SUMMARY_FIELDS:
+        if film.get(field) is not None:
+            entry[field] = film[field]
+    return entry
+
+
+def record(entries, recorded):
+    for entry in entries:
+        recorded.append(entry)
+        yield entry
+
+
+class LetterboxdClient:
+    def __init__(self, access_token, pool_size=RUNTIME_WORKERS + PAGE_WORKERS, runtime_cache=None, token_manager=None,
+                 max_retries=MAX_RETRIES, backoff=BACKOFF, max_backoff=MAX_BACKOFF):
+        self.access_token = access_token
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.token_manager = token_manager if token_manager is not None else find_token_manager(access_token)
+        self.runtime_cache = runtime_cache if runtime_cache is not None else get_runtime_cache()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.page_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PAGE_WORKERS)
+        self.runtime_executor = concurrent.futures.ThreadPoolExecutor(max_workers=RUNTIME_WORKERS)
+        self.runtime_sources = collections.Counter()
+        self._documents = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._blocked_until = 0
+
+    def _retry_delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                delay = self._blocked_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def get(self, path, params=None):
+        access_token = self.token_manager.token() if self.token_manager else self.access_token
+        refreshed = False
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause()
+            try:
+                with metrics.span('api.request'):
+                    response = self.session.get(f"{API_URL}{path}", params=params, headers={'Authorization': f'Bearer {access_token}'})
+            except requests.ConnectionError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt)
+                metrics.count('api.retries')
+                logger.warning(f"Retrying {path} after {e!r} in {delay:.1f}s...")
+                time.sleep(delay)
+                continue
+            metrics.count('api.requests')
+            metrics.count('api.bytes', len(response.content))
+            if response.status_code == 200:
+                return response
+            metrics.count(f'api.status_{response.status_code}')
+            if response.status_code == 401 and self.token_manager and not refreshed:
+                refreshed = True
+                metrics.count('api.token_refreshes')
+                access_token = self.token_manager.refresh(access_token)
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            delay = self._retry_delay(attempt)
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                # Every thread sharing this client waits out the server's Retry-After, not just this one.
+                delay = retry_after + random.uniform(0, self.backoff)
+                self.pause(delay)
+            metrics.count('api.retries')
+            logger.warning(f"Retrying {path} after {response.status_code} in {delay:.1f}s...")
+            time.sleep(delay)
+        return response
+
+    def get_document(self, path, description):
+        with self._lock:
+            if path in self._documents:
+                return self._documents[path]
+            lock = self._locks.setdefault(path, threading.Lock())
+        with lock:
+            if path in self._documents:
+                return self._documents[path]
+            response = self.get(path)
+            if response.status_code == 200:
+                self._documents[path] = response.json()
+                return self._documents[path]
+            else:
+                error_message = f"Failed to fetch {description}: {response.status_code} - {response.text}"
+                logger.error(error_message)
+                raise Exception(error_message)
+
+    def get_member(self, user_id):
+        return self.get_document(f"/member/{user_id}", "member")
+
+    def get_statistics(self, user_id):
+        return self.get_document(f"/member/{user_id}/statistics", "member statistics")
+
+    def forget(self, user_id):
+        with self._lock:
+            self._documents.pop(f"/member/{user_id}", None)
+            self._documents.pop(f"/member/{user_id}/statistics", None)
+            self._locks.pop(f"/member/{user_id}", None)
+            self._locks.pop(f"/member/{user_id}/statistics", None)
+
+    def close(self):
+        self.page_executor.shutdown()
+        self.runtime_executor.shutdown()
+        self.session.close()
+
+    def get_user_id(self, username):
+        logger.info(f"Fetching user ID for username: {username}...")
+        params = {
+            "input": username,
+            "include": "MemberSearchItem"
+        }
+        response = self.get("/search", params=params)
+        if response.status_code == 200:
+            items = response.json()["items"]
+            if not items:
+                raise UserNotFound(f"No Letterboxd user found for {username}")
+            user_id = items[0]['member']["id"]
+            logger.info(f"User ID for {username} is {user_id}.")
+            return user_id
+        else:
+            error_message = f"Failed to fetch user ID: {response.status_code} - {response.text}"
+            logger.error(error_message)
+            raise Exception(error_message)
+
+    def get_display_name(self, user_id):
+        logger.debug("Fetching display name for user ID: %s...", user_id)
+        display_name = self.get_member(user_id)["displayName"]
+        logger.info(f"Display name for user ID {user_id} is {display_name}.")
         return display_name
-    else:
-        error_message = f"Failed to fetch display name: {response.status_code} - {response.text}"
-        print(error_message)
-        raise Exception(error_message)
 
-def get_profile_picture(access_token, user_id):
-    print(f"Fetching profile picture for user ID: {user_id}...")
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    response = requests.get(f"https://api.letterboxd.com/api/v0/member/{user_id}", headers=headers)
-    if response.status_code == 200:
-        avatars = response.json()["avatar"]['sizes']
-        profile_picture = next(size['url'] for size in avatars if size['height'] == 1000)
-        print(f"Profile picture URL for user ID {user_id}: {profile_picture}")
+    def get_profile_picture(self, user_id, size=PROFILE_PICTURE_SIZE):
+        logger.debug("Fetching profile picture for user ID: %s...", user_id)
+        avatars = self.get_member(user_id)["avatar"]['sizes']
+        profile_picture = pick_image_size(avatars, size)
+        logger.info(f"Profile picture URL for user ID {user_id}: {profile_picture}")
         return profile_picture
-    else:
-        error_message = f"Failed to fetch profile picture: {response.status_code} - {response.text}"
-        print(error_message)
-        raise Exception(error_message)
 
-def get_favorite_posters(access_token, user_id):
-    print(f"Fetching favorite posters for user ID: {user_id}...")
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    response = requests.get(f"https://api.letterboxd.com/api/v0/member/{user_id}", headers=headers)
-    if response.status_code == 200:
-        data = response.json()
+    def get_favorite_posters(self, user_id, size=FAVORITE_POSTER_SIZE):
+        logger.debug("Fetching favorite posters for user ID: %s...", user_id)
+        data = self.get_member(user_id)
         favorite_posters = []
         if 'favoriteFilms' in data:
             for film in data['favoriteFilms']:
                 if 'poster' in film and 'sizes' in film['poster']:
-                    largest_poster = next((size['url'] for size in film['poster']['sizes'] if size['height'] == 3000), None)
-                    favorite_posters.append(largest_poster)
-        print(f"Retrieved {len(favorite_posters)} favorite posters.")
+                    favorite_posters.append(pick_image_size(film['poster']['sizes'], size))
+        logger.info(f"Retrieved {len(favorite_posters)} favorite posters.")
         return favorite_posters
-    else:
-        error_message = f"Failed to fetch favorite posters: {response.status_code} - {response.text}"
-        print(error_message)
-        raise Exception(error_message)
 
-def get_diary_entries_this_year(access_token, user_id):
-    print(f"Fetching diary entries for this year for user ID: {user_id}...")
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    response = requests.get(f"https://api.letterboxd.com/api/v0/member/{user_id}/statistics", headers=headers)
-    if response.status_code == 200:
-        data = response.json()['counts']['diaryEntriesThisYear']
+    def get_diary_entries_this_year(self, user_id):
+        logger.debug("Fetching diary entries for this year for user ID: %s...", user_id)
+        data = self.get_statistics(user_id)['counts']['diaryEntriesThisYear']
         formatted_data = f"{data:,}"
-        print(f"Diary entries this year: {formatted_data}")
+        logger.info(f"Diary entries this year: {formatted_data}")
         return formatted_data
-    else:
-        error_message = f"Failed to fetch diary entries: {response.status_code} - {response.text}"
-        print(error_message)
-        raise Exception(error_message)
 
-def get_watches(access_token, user_id):
-    print(f"Fetching total watches for user ID: {user_id}...")
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    response = requests.get(f"https://api.letterboxd.com/api/v0/member/{user_id}/statistics", headers=headers)
-    if response.status_code == 200:
-        data = response.json()['counts']['watches']
+    def get_watches(self, user_id):
+        logger.debug("Fetching total watches for user ID: %s...", user_id)
+        data = self.get_statistics(user_id)['counts']['watches']
         formatted_data = f"{data:,}"
-        print(f"Total watches: {formatted_data}")
+        logger.info(f"Total watches: {formatted_data}")
         return formatted_data
-    else:
-        error_message = f"Failed to fetch total watches: {response.status_code} - {response.text}"
-        print(error_message)
-        raise Exception(error_message)
 
-def get_list_of_watches(access_token, user_id):
-    print("Starting to fetch the list of watched films...")
-    cursor = 'start=0'
-    all_ratings = []
-
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    params = {
-        "perPage": 100,
-        "member": user_id,
-        "memberRelationship": "Watched",
-        "sort": "MemberRatingHighToLow",
-        "cursor": cursor
-    }
-
-    while True:
-        print(f"Fetching page with cursor: {cursor}")
-        response = requests.get("https://api.letterboxd.com/api/v0/films/", params=params, headers=headers)
+    def _fetch_page(self, path, params, cursor):
+        logger.debug("Fetching page with cursor: %s", cursor)
+        response = self.get(path, params=dict(params, cursor=cursor))
         if response.status_code == 200:
             results = response.json()
-            print(f"Retrieved {len(results['items'])} items from current page.")
-            
-            for item in results['items']:
-                entry = {'film': item.get('id')}
-                all_ratings.append(entry)
-            
-            if 'next' in results:
-                cursor = results['next']
-                params['cursor'] = cursor
-                print("Moving to the next page...")
-            else:
-                print("No more pages to fetch.")
-                break
+            logger.debug("Retrieved %d items from current page.", len(results['items']))
+            return results
         else:
-            print(f"Error fetching data: {response.status_code} - {response.text}")
-            break
+            logger.error(f"Error fetching data: {response.status_code} - {response.text}")
+            return None
 
-    print(f"Completed fetching watched films. Total films retrieved: {len(all_ratings)}")
-    return all_ratings
+    def iter_pages(self, path, params, total=None, parallel=True):
+        page = self._fetch_page(path, params, 'start=0')
+        if page is None:
+            return
+        yield page
+        cursor = page.get('next')
+        match = CURSOR_PATTERN.match(cursor) if cursor else None
+        if parallel and match and total:
+            offsets = iter(range(int(match.group(1)), total, params['perPage']))
+            logger.debug("Fetching the remaining pages concurrently...")
+            # Only a window of pages is fetched ahead of the consumer, so a slow consumer holds a few pages, not the whole list.
+            futures = collections.deque(self.page_executor.submit(self._fetch_page, path, params, f"start={offset}") for offset in itertools.islice(offsets, PAGE_WINDOW))
+            try:
+                while futures:
+                    page = futures.popleft().result()
+                    if page is None:
+                        return
+                    for offset in itertools.islice(offsets, 1):
+                        futures.append(self.page_executor.submit(self._fetch_page, path, params, f"start={offset}"))
+                    yield page
+            finally:
+                for future in futures:
+                    future.cancel()
+            cursor = page.get('next')
 
-def get_list_of_watches_this_year(access_token, user_id):
-    print(f"Starting to fetch the list of films watched this year for user ID: {user_id}...")
-    cursor = 'start=0'
-    all_ratings = []
+        while cursor:
+            logger.debug("Moving to the next page...")
+            page = self._fetch_page(path, params, cursor)
+            if page is None:
+                break
+            yield page
+            cursor = page.get('next')
+        logger.debug("No more pages to fetch.")
 
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    params = {
-        "perPage": 100,
-        "member": user_id,
-        "cursor": cursor,
-        "year": date.today().year
-    }
-    
-    while True:
-        print(f"Fetching page with cursor: {cursor}")
-        response = requests.get("https://api.letterboxd.com/api/v0/log-entries/", params=params, headers=headers)
+    def _get_count(self, user_id, key):
+        try:
+            return self.get_statistics(user_id)['counts'][key]
+        except Exception as e:
+            logger.warning(f"Could not read {key} count, paging sequentially: {e}")
+            return None
+
+    def iter_watches(self, user_id, parallel=True):
+        logger.info("Starting to fetch the list of watched films...")
+        params = {
+            "perPage": 100,
+            "member": user_id,
+            "memberRelationship": "Watched",
+            "sort": "MemberRatingHighToLow"
+        }
+        total = self._get_count(user_id, 'watches') if parallel else None
+
+        seen = set()
+        for page in self.iter_pages("/films/", params, total, parallel):
+            for item in page['items']:
+                if item.get('id') not in seen:
+                    seen.add(item.get('id'))
+                    yield film_entry(item)
+
+        logger.info(f"Completed fetching watched films. Total films retrieved: {len(seen)}")
+
+    def iter_watches_this_year(self, user_id, parallel=True):
+        logger.info(f"Starting to fetch the list of films watched this year for user ID: {user_id}...")
+        params = {
+            "perPage": 100,
+            "member": user_id,
+            "year": date.today().year
+        }
+        total = self._get_count(user_id, 'diaryEntriesThisYear') if parallel else None
+
+        seen = set()
+        retrieved = 0
+        for page in self.iter_pages("/log-entries/", params, total, parallel):
+            for item in page['items']:
+                if item.get('id') is None or item['id'] not in seen:
+                    seen.add(item.get('id'))
+                    retrieved += 1
+                    entry = film_entry(item['film'])
+                    entry['logEntry'] = item.get('id')
+                    yield entry
+
+        logger.info(f"Completed fetching films watched this year. Total films retrieved: {retrieved}")
+
+    def get_list_of_watches(self, user_id, parallel=True):
+        return list(self.iter_watches(user_id, parallel))
+
+    def get_list_of_watches_this_year(self, user_id, parallel=True):
+        return list(self.iter_watches_this_year(user_id, parallel))
+
+    def get_film_runtime(self, film):
+        logger.debug("Fetching runtime for film ID: %s...", film['film'])
+        response = self.get(f"/film/{film['film']}")
         if response.status_code == 200:
             results = response.json()
-            print(f"Retrieved {len(results['items'])} items from current page.")
-
-            for item in results['items']:
-                entry = {'film': item['film']['id']}
-                all_ratings.append(entry)
-            
-            if 'next' in results:
-                cursor = results['next']
-                params['cursor'] = cursor
-                print("Moving to the next page...")
-            else:
-                print("No more pages to fetch.")
-                break
+            logger.debug("Runtime for film ID %s: %s minutes", film['film'], results['runTime'])
+            return results["runTime"]
         else:
-            print(f"Error fetching data: {response.status_code} - {response.text}")
-            break
+            error_message = f"Failed to fetch film runtime: {response.status_code} - {response.text}"
+            logger.error(error_message)
+            raise Exception(error_message)
 
-    print(f"Completed fetching films watched this year. Total films retrieved: {len(all_ratings)}")
-    return all_ratings
+    def get_cached_film_runtime(self, film_id):
+        return self.runtime_cache.get_or_fetch(film_id, lambda film_id: self.get_film_runtime({'film': film_id}))
 
-def get_film_runtime(film, headers):
-    print(f"Fetching runtime for film ID: {film['film']}...")
-    response = requests.get(f"https://api.letterboxd.com/api/v0/film/{film['film']}", headers=headers)
-    if response.status_code == 200:
-        results = response.json()
-        print(f"Runtime for film ID {film['film']}: {results['runTime']} minutes")
-        return results["runTime"]
-    else:
-        error_message = f"Failed to fetch film runtime: {response.status_code} - {response.text}"
-        print(error_message)
-        raise Exception(error_message)
+    def get_total_watch_time(self, film_list):
+        logger.info("Calculating total watch time for the film list...")
+        total_run_time, _ = self.get_total_run_time(film_list)
+        total_run_time_in_hours = round(total_run_time / 60)
+        formatted_data = f"{total_run_time_in_hours:,}"
+        logger.info(f"Total watch time: {total_run_time_in_hours} hours")
+        return formatted_data
 
-def get_total_watch_time(access_token, film_list):
-    print("Calculating total watch time for the film list...")
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
+    def get_total_run_time(self, film_list):
+        total_run_time = 0
+        sources = collections.Counter()
+        pending = {}
+        counts = {}
+        failed = set()
 
-    total_run_time = 0
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = [executor.submit(get_film_runtime, film, headers) for film in film_list]
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                total_run_time += future.result()
-            except Exception as e:
-                print(f"Error calculating runtime: {e}")
-    total_run_time_in_hours = round(total_run_time / 60)
-    formatted_data = f"{total_run_time_in_hours:,}"
-    print(f"Total watch time: {total_run_time_in_hours} hours")
-    return formatted_data
+        def collect(futures):
+            nonlocal total_run_time
+            for future in futures:
+                film_id = pending.pop(future)
+                count = counts.pop(film_id)
+                try:
+                    total_run_time += future.result() * count
+                except Exception as e:
+                    failed.add(film_id)
+                    logger.error(f"Error calculating runtime: {e}")
 
-def get_histogram(access_token, user_id):
-    print(f"Fetching ratings histogram for user ID: {user_id}...")
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
-    response = requests.get(f"https://api.letterboxd.com/api/v0/member/{user_id}/statistics", headers=headers)
-    if response.status_code == 200:
-        ratings_histogram = response.json()['ratingsHistogram']
-        print("Ratings histogram fetched successfully.")
+        for film in film_list:
+            film_id = film['film']
+            if film_id in counts:
+                counts[film_id] += 1
+                continue
+            if film_id in failed:
+                continue
+            if film.get('runTime') is not None:
+                self.runtime_cache.put(film_id, film['runTime'])
+                total_run_time += film['runTime']
+                sources['list'] += 1
+                continue
+            runtime = self.runtime_cache.get(film_id)
+            if runtime is not None:
+                total_run_time += runtime
+                sources['cache'] += 1
+                continue
+            sources['detail'] += 1
+            pending[self.runtime_executor.submit(self.get_cached_film_runtime, film_id)] = film_id
+            counts[film_id] = 1
+            if len(pending) >= MAX_PENDING_RUNTIMES:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+        collect(list(pending))
+        self.runtime_cache.flush()
+
+        self.runtime_sources.update(sources)
+        for source, films in sources.items():
+            metrics.count(f'runtimes.{source}', films)
+        logger.info(f"Runtimes: {sources['list']} from list pages, {sources['cache']} cached, {sources['detail']} fetched per film.")
+        if failed:
+            logger.warning(f"Left {len(failed)} films without a runtime out of the total.")
+        return total_run_time, failed
+
+    def iter_new_log_entries(self, user_id, known_log_entries):
+        params = {
+            "perPage": 100,
+            "member": user_id,
+            "year": date.today().year,
+            "sort": "WhenAdded"
+        }
+        for page in self.iter_pages("/log-entries/", params, parallel=False):
+            for item in page['items']:
+                if item.get('id') in known_log_entries:
+                    return
+                entry = film_entry(item['film'])
+                entry['logEntry'] = item.get('id')
+                yield entry
+
+    def sync_watch_time(self, user_id, store=None):
+        store = store if store is not None else get_snapshot_store()
+        counts = self.get_statistics(user_id)['counts']
+        year = date.today().year
+        snapshot = store.load(user_id)
+        has_films = snapshot is not None
+        if snapshot is None:
+            logger.info(f"No snapshot for user ID {user_id}, running a full sync...")
+            snapshot = new_snapshot(year)
+        elif snapshot['year'] != year:
+            logger.info(f"Rolling this year's totals over from {snapshot['year']} to {year}...")
+            snapshot.update(year=year, log_entries=[], year_minutes=0)
+
+        films = set(snapshot['films'])
+        log_entries = set(snapshot['log_entries'])
+        if log_entries:
+            new_entries = list(self.iter_new_log_entries(user_id, log_entries))
+        else:
+            new_entries = list(self.iter_watches_this_year(user_id))
+        logger.info(f"Found {len(new_entries)} new log entries this year.")
+        # Films whose runtime could not be fetched stay out of the snapshot, so the counts
+        # disagree with the statistics and the next sync counts them again.
+        minutes, failed = self.get_total_run_time(new_entries)
+        snapshot['year_minutes'] += minutes
+        log_entries.update(entry['logEntry'] for entry in new_entries if entry['film'] not in failed)
+        if has_films:
+            new_films = list({entry['film']: entry for entry in new_entries if entry['film'] not in films}.values())
+            minutes, failed = self.get_total_run_time(new_films)
+            snapshot['watch_minutes'] += minutes
+            films.update(entry['film'] for entry in new_films if entry['film'] not in failed)
+
+        if len(log_entries) != counts['diaryEntriesThisYear']:
+            logger.warning("This year's log entries are out of sync, refetching them...")
+            recorded = []
+            snapshot['year_minutes'], failed = self.get_total_run_time(record(self.iter_watches_this_year(user_id), recorded))
+            log_entries = {entry['logEntry'] for entry in recorded if entry['film'] not in failed}
+        if len(films) != counts['watches']:
+            if has_films:
+                logger.warning("Watched films are out of sync, refetching them...")
+            recorded = []
+            snapshot['watch_minutes'], failed = self.get_total_run_time(record(self.iter_watches(user_id), recorded))
+            films = {entry['film'] for entry in recorded if entry['film'] not in failed}
+
+        snapshot['films'] = sorted(films)
+        snapshot['log_entries'] = sorted(log_entries)
+        store.save(user_id, snapshot)
+        total_watch_time = f"{round(snapshot['watch_minutes'] / 60):,}"
+        total_watch_time_this_year = f"{round(snapshot['year_minutes'] / 60):,}"
+        logger.info(f"Total watch time: {total_watch_time} hours, {total_watch_time_this_year} hours this year")
+        return total_watch_time, total_watch_time_this_year
+
+    def get_histogram(self, user_id):
+        logger.debug("Fetching ratings histogram for user ID: %s...", user_id)
+        ratings_histogram = self.get_statistics(user_id)['ratingsHistogram']
+        logger.debug("Ratings histogram fetched successfully.")
         simplified_histogram = []
         for rating_data in ratings_histogram:
             simplified_histogram.append({
                 "rating": rating_data["rating"],
                 "count": rating_data["count"]
             })
-        print(f"Processed ratings histogram: {simplified_histogram}")
+        logger.info(f"Processed ratings histogram: {simplified_histogram}")
         return simplified_histogram
-    else:
-        error_message = f"Failed to fetch ratings histogram: {response.status_code} - {response.text}"
-        print(error_message)
-        raise Exception(error_message)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(access_token):
+    token_manager = find_token_manager(access_token)
+    key = token_manager or access_token
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = LetterboxdClient(access_token, token_manager=token_manager)
+        return _clients[key]
+
+def get_user_id(access_token, username):
+    return get_client(access_token).get_user_id(username)
+
+def get_display_name(access_token, user_id):
+    return get_client(access_token).get_display_name(user_id)
+
+def get_profile_picture(access_token, user_id, size=PROFILE_PICTURE_SIZE):
+    return get_client(access_token).get_profile_picture(user_id, size)
+
+def get_favorite_posters(access_token, user_id, size=FAVORITE_POSTER_SIZE):
+    return get_client(access_token).get_favorite_posters(user_id, size)
+
+def get_diary_entries_this_year(access_token, user_id):
+    return get_client(access_token).get_diary_entries_this_year(user_id)
+
+def get_watches(access_token, user_id):
+    return get_client(access_token).get_watches(user_id)
+
+def iter_watches(access_token, user_id, parallel=True):
+    return get_client(access_token).iter_watches(user_id, parallel)
+
+def iter_watches_this_year(access_token, user_id, parallel=True):
+    return get_client(access_token).iter_watches_this_year(user_id, parallel)
+
+def get_list_of_watches(access_token, user_id, parallel=True):
+    return get_client(access_token).get_list_of_watches(user_id, parallel)
+
+def get_list_of_watches_this_year(access_token, user_id, parallel=True):
+    return get_client(access_token).get_list_of_watches_this_year(user_id, parallel)
+
+def get_film_runtime(film, headers):
+    access_token = headers['Authorization'].removeprefix('Bearer ')
+    return get_client(access_token).get_film_runtime(film)
+
+def get_total_watch_time(access_token, film_list):
+    return get_client(access_token).get_total_watch_time(film_list)
+
+def sync_watch_time(access_token, user_id):
+    return get_client(access_token).sync_watch_time(user_id)
+
+def get_histogram(access_token, user_id):
+    return get_client(access_token).get_histogram(user_id)
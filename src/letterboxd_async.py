@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from datetime import date
+
+import aiohttp
+
+import letterboxd_api
+import metrics
+from letterboxd_api import RETRY_STATUSES, parse_retry_after
+from runtime_cache import get_runtime_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate=10, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncLetterboxdClient:
+    def __init__(self, access_token, concurrency=letterboxd_api.RUNTIME_WORKERS, rate=10, burst=None,
+                 max_retries=letterboxd_api.MAX_RETRIES, backoff=letterboxd_api.BACKOFF, max_backoff=letterboxd_api.MAX_BACKOFF, runtime_cache=None, token_manager=None):
+        self.access_token = access_token
+        self.token_manager = token_manager if token_manager is not None else letterboxd_api.find_token_manager(access_token)
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.runtime_cache = runtime_cache if runtime_cache is not None else get_runtime_cache()
+        self.session = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._documents = {}
+        self._runtime_tasks = {}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _retry_delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    async def _token(self):
+        if self.token_manager is None:
+            return self.access_token
+        return self.token_manager.cached() or await asyncio.to_thread(self.token_manager.token)
+
+    async def get(self, path, params=None, description="data"):
+        await self.open()
+        url = f"{letterboxd_api.API_URL}{path}"
+        refreshed = False
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            access_token = await self._token()
+            async with self._semaphore:
+                try:
+                    async with self.session.get(url, params=params, headers={'Authorization': f'Bearer {access_token}'}) as response:
+                        metrics.count('api.requests')
+                        if response.status == 200:
+                            body = await response.read()
+                            metrics.count('api.bytes', len(body))
+                            return json.loads(body)
+                        text = await response.text()
+                        metrics.count(f'api.status_{response.status}')
+                        if response.status == 401 and self.token_manager is not None and not refreshed and attempt < self.max_retries:
+                            refreshed = True
+                            metrics.count('api.token_refreshes')
+                            await asyncio.to_thread(self.token_manager.refresh, access_token)
+                            continue
+                        if response.status not in RETRY_STATUSES or attempt == self.max_retries:
+                            error_message = f"Failed to fetch {description}: {response.status} - {text}"
+                            logger.error(error_message)
+                            raise Exception(error_message)
+                        delay = self._retry_delay(attempt)
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        if retry_after is not None:
+                            delay = retry_after + random.uniform(0, self.backoff)
+                            self.bucket.pause(delay)
+                        metrics.count('api.retries')
+                        logger.warning(f"Retrying {description} after {response.status} in {delay:.1f}s...")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._retry_delay(attempt)
+                    metrics.count('api.retries')
+                    logger.warning(f"Retrying {description} after {e!r} in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+    async def get_document(self, path, description):
+        if path not in self._documents:
+            self._documents[path] = asyncio.ensure_future(self.get(path, description=description))
+        try:
+            return await self._documents[path]
+        except Exception:
+            self._documents.pop(path, None)
+            raise
+
+    async def get_member(self, user_id):
+        return await self.get_document(f"/member/{user_id}", "member")
+
+    async def get_statistics(self, user_id):
+        return await self.get_document(f"/member/{user_id}/statistics", "member statistics")
+
+    async def get_user_id(self, username):
+        logger.info(f"Fetching user ID for username: {username}...")
+        params = {
+            "input": username,
+            "include": "MemberSearchItem"
+        }
+        results = await self.get("/search", params=params, description="user ID")
+        if not results["items"]:
+            raise letterboxd_api.UserNotFound(f"No Letterboxd user found for {username}")
+        user_id = results["items"][0]['member']["id"]
+        logger.info(f"User ID for {username} is {user_id}.")
+        return user_id
+
+    async def get_display_name(self, user_id):
+        return (await self.get_member(user_id))["displayName"]
+
+    async def get_profile_picture(self, user_id, size=letterboxd_api.PROFILE_PICTURE_SIZE):
+        avatars = (await self.get_member(user_id))["avatar"]['sizes']
+        return letterboxd_api.pick_image_size(avatars, size)
+
+    async def get_favorite_posters(self, user_id, size=letterboxd_api.FAVORITE_POSTER_SIZE):
+        data = await self.get_member(user_id)
+        favorite_posters = []
+        for film in data.get('favoriteFilms', []):
+            if 'poster' in film and 'sizes' in film['poster']:
+                favorite_posters.append(letterboxd_api.pick_image_size(film['poster']['sizes'], size))
+        return favorite_posters
+
+    async def get_diary_entries_this_year(self, user_id):
+        return f"{(await self.get_statistics(user_id))['counts']['diaryEntriesThisYear']:,}"
+
+    async def get_watches(self, user_id):
+        return f"{(await self.get_statistics(user_id))['counts']['watches']:,}"
+
+    async def get_histogram(self, user_id):
+        ratings_histogram = (await self.get_statistics(user_id))['ratingsHistogram']
+        return [{"rating": rating_data["rating"], "count": rating_data["count"]} for rating_data in ratings_histogram]
+
+    async def get_pages(self, path, params, total=None, parallel=True, description="data"):
+        params = dict(params, perPage=100)
+        first_page = await self.get(path, params=dict(params, cursor='start=0'), description=description)
+        pages = [first_page]
+        cursor = first_page.get('next')
+        match = letterboxd_api.CURSOR_PATTERN.match(cursor) if cursor else None
+        if parallel and match and total:
+            offsets = range(int(match.group(1)), total, params['perPage'])
+            pages.extend(await asyncio.gather(*(self.get(path, params=dict(params, cursor=f"start={offset}"), description=description) for offset in offsets)))
+            cursor = pages[-1].get('next')
+        while cursor:
+            page = await self.get(path, params=dict(params, cursor=cursor), description=description)
+            pages.append(page)
+            cursor = page.get('next')
+        return pages
+
+    async def _get_count(self, user_id, key):
+        try:
+            return (await self.get_statistics(user_id))['counts'][key]
+        except Exception as e:
+            logger.warning(f"Could not read {key} count, paging sequentially: {e}")
+            return None
+
+    async def get_list_of_watches(self, user_id, parallel=True):
+        params = {
+            "member": user_id,
+            "memberRelationship": "Watched",
+            "sort": "MemberRatingHighToLow"
+        }
+        total = await self._get_count(user_id, 'watches') if parallel else None
+        all_ratings = []
+        seen = set()
+        for page in await self.get_pages("/films/", params, total, parallel, "watched films"):
+            for item in page['items']:
+                if item.get('id') not in seen:
+                    seen.add(item.get('id'))
+                    all_ratings.append(letterboxd_api.film_entry(item))
+        logger.info(f"Completed fetching watched films. Total films retrieved: {len(all_ratings)}")
+        return all_ratings
+
+    async def get_list_of_watches_this_year(self, user_id, parallel=True):
+        params = {
+            "member": user_id,
+            "year": date.today().year
+        }
+        total = await self._get_count(user_id, 'diaryEntriesThisYear') if parallel else None
+        all_ratings = []
+        seen = set()
+        for page in await self.get_pages("/log-entries/", params, total, parallel, "films watched this year"):
+            for item in page['items']:
+                if item.get('id') is None or item['id'] not in seen:
+                    seen.add(item.get('id'))
+                    all_ratings.append(letterboxd_api.film_entry(item['film']))
+        logger.info(f"Completed fetching films watched this year. Total films retrieved: {len(all_ratings)}")
+        return all_ratings
+
+    async def get_film_runtime(self, film):
+        results = await self.get(f"/film/{film['film']}", description=f"runtime for film ID {film['film']}")
+        return results["runTime"]
+
+    async def _fetch_runtime(self, film_id):
+        runtime = await self.get_film_runtime({'film': film_id})
+        self.runtime_cache.put(film_id, runtime)
+        return runtime
+
+    def get_cached_film_runtime(self, film_id):
+        if film_id not in self._runtime_tasks:
+            self._runtime_tasks[film_id] = asyncio.ensure_future(self._fetch_runtime(film_id))
+            self._runtime_tasks[film_id].add_done_callback(lambda task: self._runtime_tasks.pop(film_id, None))
+        return self._runtime_tasks[film_id]
+
+    async def get_total_watch_time(self, film_list):
+        logger.info("Calculating total watch time for the film list...")
+        film_ids = [film['film'] for film in film_list]
+        runtimes = {}
+        for film in film_list:
+            if film.get('runTime') is not None and film['film'] not in runtimes:
+                runtimes[film['film']] = film['runTime']
+                self.runtime_cache.put(film['film'], film['runTime'])
+        from_list = len(runtimes)
+        missing = []
+        for film_id in dict.fromkeys(film_ids):
+            if film_id in runtimes:
+                continue
+            runtime = self.runtime_cache.get(film_id)
+            if runtime is None:
+                missing.append(film_id)
+            else:
+                runtimes[film_id] = runtime
+        logger.info(f"Runtimes: {from_list} from list pages, {len(runtimes) - from_list} cached, {len(missing)} fetched per film.")
+
+        results = await asyncio.gather(*(self.get_cached_film_runtime(film_id) for film_id in missing), return_exceptions=True)
+        for film_id, result in zip(missing, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error calculating runtime: {result}")
+            else:
+                runtimes[film_id] = result
+        self.runtime_cache.flush()
+
+        total_run_time = sum(runtimes[film_id] for film_id in film_ids if film_id in runtimes)
+        total_run_time_in_hours = round(total_run_time / 60)
+        logger.info(f"Total watch time: {total_run_time_in_hours} hours")
+        return f"{total_run_time_in_hours:,}"
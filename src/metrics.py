@@ -0,0 +1,118 @@
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+METRIC_PREFIX = 'posterboxd'
+FORMATS = ('json', 'prometheus')
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = collections.Counter()
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += value
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            span = self.spans.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            span['count'] += 1
+            span['seconds'] += seconds
+            span['max_seconds'] = max(span['max_seconds'], seconds)
+
+    @contextlib.contextmanager
+    def _span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def span(self, name):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._span(name)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'spans': {name: dict(span) for name, span in self.spans.items()}
+            }
+
+    def merge(self, snapshot):
+        with self._lock:
+            self.counters.update(snapshot['counters'])
+            for name, other in snapshot['spans'].items():
+                span = self.spans.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+                span['count'] += other['count']
+                span['seconds'] += other['seconds']
+                span['max_seconds'] = max(span['max_seconds'], other['max_seconds'])
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.spans.clear()
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {METRIC_PREFIX}_events_total counter"]
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'{METRIC_PREFIX}_events_total{{name="{name}"}} {value}')
+        for field, kind in (('count', 'counter'), ('seconds', 'counter'), ('max_seconds', 'gauge')):
+            metric = f"{METRIC_PREFIX}_span_{field}" + ('_total' if kind == 'counter' else '')
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, span in sorted(snapshot['spans'].items()):
+                lines.append(f'{metric}{{span="{name}"}} {span[field]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, format='json'):
+        if format not in FORMATS:
+            raise Exception(f"Unknown profile format {format}, expected one of {', '.join(FORMATS)}")
+        output = self.to_prometheus() if format == 'prometheus' else self.to_json()
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, 'w') as f:
+            f.write(output)
+        os.replace(temporary_path, path)
+
+
+metrics = Metrics()
+
+def span(name):
+    return metrics.span(name)
+
+def count(name, value=1):
+    metrics.count(name, value)
+
+def record(name, seconds):
+    metrics.record(name, seconds)
+
+def enable():
+    metrics.enabled = True
+    return metrics
+
+def add_arguments(parser):
+    parser.add_argument("--profile", metavar="PATH", default=None, help="write per-stage timings and counters to PATH")
+    parser.add_argument("--profile-format", choices=FORMATS, default='json', help="json, or prometheus for a node_exporter textfile")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default='INFO', help="DEBUG also logs every page and film fetched")
+
+def configure(args):
+    logging.basicConfig(level=args.log_level, format='%(message)s')
+    if args.profile:
+        enable()
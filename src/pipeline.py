@@ -0,0 +1,82 @@
+import concurrent.futures
+import logging
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    def __init__(self, name, func, dependencies):
+        self.name = name
+        self.func = func
+        self.dependencies = dependencies
+        self.started = None
+        self.finished = None
+
+    @property
+    def duration(self):
+        return self.finished - self.started
+
+
+class Pipeline:
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self.stages = {}
+        self.results = {}
+
+    def add(self, name, func, *dependencies):
+        for dependency in dependencies:
+            if dependency not in self.stages:
+                raise Exception(f"Stage {name} depends on unknown stage {dependency}")
+        self.stages[name] = Stage(name, func, dependencies)
+
+    def _run_stage(self, stage):
+        stage.started = time.perf_counter()
+        try:
+            return stage.func(*(self.results[dependency] for dependency in stage.dependencies))
+        finally:
+            stage.finished = time.perf_counter()
+            metrics.record(f'stage.{stage.name}', stage.duration)
+
+    def run(self):
+        self.results = {}
+        self.started = time.perf_counter()
+        waiting = dict(self.stages)
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while waiting or running:
+                for name, stage in list(waiting.items()):
+                    if all(dependency in self.results for dependency in stage.dependencies):
+                        running[executor.submit(self._run_stage, stage)] = name
+                        del waiting[name]
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception:
+                        for pending in running:
+                            pending.cancel()
+                        logger.error(f"Stage {name} failed.")
+                        raise
+        self.finished = time.perf_counter()
+        return self.results
+
+    def critical_path(self):
+        stage = max(self.stages.values(), key=lambda stage: stage.finished)
+        path = [stage]
+        while stage.dependencies:
+            stage = max((self.stages[dependency] for dependency in stage.dependencies), key=lambda stage: stage.finished)
+            path.append(stage)
+        return path[::-1]
+
+    def report(self):
+        total = self.finished - self.started
+        serial = sum(stage.duration for stage in self.stages.values())
+        print(f"Pipeline finished in {total:.2f}s ({serial:.2f}s if run one after another).")
+        for stage in sorted(self.stages.values(), key=lambda stage: stage.started):
+            print(f"  {stage.name}: {stage.started - self.started:.2f}s -> {stage.finished - self.started:.2f}s ({stage.duration:.2f}s)")
+        path = self.critical_path()
+        print("Critical path: " + " -> ".join(f"{stage.name} ({stage.duration:.2f}s)" for stage in path))
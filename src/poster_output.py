@@ -0,0 +1,129 @@
+import concurrent.futures
+import io
+import os
+import threading
+
+from PIL import Image
+
+import metrics
+import render_budget
+
+# format name: (Pillow format, file extension, content type)
+FORMATS = {
+    'png': ('PNG', '.png', 'image/png'),
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+    'webp': ('WEBP', '.webp', 'image/webp')
+}
+DEFAULT_COMPRESS_LEVEL = 6
+DEFAULT_QUALITY = 90
+ENCODE_WORKERS = 2
+
+
+class PosterOutput:
+    def __init__(self, format='png', quality=DEFAULT_QUALITY, compress_level=DEFAULT_COMPRESS_LEVEL, variants=()):
+        if format not in FORMATS:
+            raise Exception(f"Unknown output format {format}, expected one of {', '.join(FORMATS)}")
+        self.format = format
+        self.quality = quality
+        self.compress_level = compress_level
+        self.variants = tuple(variants)
+
+    @property
+    def extension(self):
+        return FORMATS[self.format][1]
+
+    @property
+    def content_type(self):
+        return FORMATS[self.format][2]
+
+    def save_options(self):
+        if self.format == 'png':
+            return {'compress_level': self.compress_level}
+        if self.format == 'jpeg':
+            return {'quality': self.quality, 'optimize': True}
+        # Faster than Pillow's default method of 4, for a somewhat larger file.
+        return {'quality': self.quality, 'method': 2}
+
+
+def downscale(image, width):
+    if width >= image.width:
+        return image
+    height = round(image.height * width / image.width)
+    return image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def encode(image, target=None, output=None, width=None):
+    output = output or PosterOutput()
+    if width is not None:
+        image = downscale(image, width)
+    stream = io.BytesIO() if target is None else target
+    with metrics.span(f'encode.{output.format}'):
+        image.save(stream, format=FORMATS[output.format][0], **output.save_options())
+    if target is None:
+        metrics.count('encode.bytes', stream.tell())
+        return stream.getvalue()
+    if isinstance(target, str):
+        metrics.count('encode.bytes', os.path.getsize(target))
+    return target
+
+
+def variant_path(path, width):
+    root, extension = os.path.splitext(path)
+    return f"{root}_{width}w{extension}"
+
+
+def save_poster(image, target, output=None):
+    output = output or PosterOutput()
+    # The canvas stays alive until it is encoded, so it counts against the render budget.
+    with render_budget.reserve(image.width * image.height * render_budget.PIXEL_BYTES):
+        written = [encode(image, target, output)]
+        if isinstance(target, str):
+            for width in output.variants:
+                written.append(encode(image, variant_path(target, width), output, width))
+    return written
+
+
+class Encoder:
+    def __init__(self, max_workers=ENCODE_WORKERS):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        future = self.executor.submit(func, *args, **kwargs)
+        with self._lock:
+            self._pending.add(future)
+        return future
+
+    def wait(self):
+        with self._lock:
+            pending = list(self._pending)
+        results = []
+        for future in pending:
+            try:
+                results.append(future.result())
+            finally:
+                with self._lock:
+                    self._pending.discard(future)
+        return results
+
+
+_default_encoder = None
+_default_encoder_lock = threading.Lock()
+
+def get_encoder():
+    global _default_encoder
+    with _default_encoder_lock:
+        if _default_encoder is None:
+            _default_encoder = Encoder()
+        return _default_encoder
+
+
+def add_arguments(parser):
+    parser.add_argument("--format", choices=list(FORMATS), default='png', help="output image format")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY, help="JPEG and WebP quality")
+    parser.add_argument("--compress-level", type=int, choices=range(10), default=DEFAULT_COMPRESS_LEVEL, metavar="0-9", help="PNG compression level; lower is faster and larger")
+    parser.add_argument("--variants", type=int, nargs='*', default=[], metavar="WIDTH", help="also write downscaled copies at these widths")
+
+def from_args(args):
+    return PosterOutput(args.format, args.quality, args.compress_level, args.variants)
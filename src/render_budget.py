@@ -0,0 +1,57 @@
+import contextlib
+import threading
+
+from layout import POSTER_LAYOUT, RENDER_SCALE, scaled
+
+# Pillow keeps RGB and RGBA images at four bytes a pixel and masks at one.
+PIXEL_BYTES = 4
+MASK_BYTES = 1
+
+
+def estimate_render_bytes(scale=RENDER_SCALE, layout=POSTER_LAYOUT):
+    width, height = scaled(layout[0]['size'], scale)
+    canvas = width * height * PIXEL_BYTES
+    inputs = 0
+    transient = 0
+    masks = 0
+    for element in layout[1:]:
+        if element['element'] in ('favorites', 'avatar'):
+            element_width, element_height = scaled(element['size'], scale)
+            inputs += len(element.get('anchors', [None])) * element_width * element_height * PIXEL_BYTES
+            transient = max(transient, element_width * element_height * PIXEL_BYTES)
+            masks += element_width * element_height * MASK_BYTES
+    return canvas + inputs + transient + masks
+
+
+class RenderBudget:
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def reserve(self, size):
+        if size > self.limit:
+            raise Exception(f"Rendering needs about {size // 2**20} MB, more than the {self.limit // 2**20} MB render budget. Lower the scale or raise the budget.")
+        with self._condition:
+            self._condition.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.used -= size
+                self._condition.notify_all()
+
+
+_budget = None
+
+def set_render_budget(limit):
+    global _budget
+    _budget = RenderBudget(limit) if limit else None
+    return _budget
+
+def reserve(size):
+    if _budget is None:
+        return contextlib.nullcontext()
+    return _budget.reserve(size)
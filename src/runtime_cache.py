@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+import time
+import concurrent.futures
+
+import metrics
+
+CACHE_PATH = 'cache/runtimes.sqlite3'
+
+
+class RuntimeCache:
+    def __init__(self, path=CACHE_PATH, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self._memory = {}
+        self._dirty = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS runtimes (film_id TEXT PRIMARY KEY, runtime INTEGER NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def _is_fresh(self, fetched_at):
+        return self.ttl is None or time.time() - fetched_at < self.ttl
+
+    def get(self, film_id):
+        with self._lock:
+            return self._get(film_id)
+
+    def _get(self, film_id):
+        if film_id in self._memory:
+            runtime, fetched_at = self._memory[film_id]
+            if self._is_fresh(fetched_at):
+                return runtime
+            return None
+        row = self._connection.execute(
+            "SELECT runtime, fetched_at FROM runtimes WHERE film_id = ?", (film_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._memory[film_id] = row
+        if self._is_fresh(row[1]):
+            return row[0]
+        return None
+
+    def put(self, film_id, runtime):
+        with self._lock:
+            self._memory[film_id] = (runtime, time.time())
+            self._dirty[film_id] = self._memory[film_id]
+
+    def get_or_fetch(self, film_id, fetch):
+        with self._lock:
+            runtime = self._get(film_id)
+            if runtime is not None:
+                metrics.count('runtime_cache.hits')
+                return runtime
+            future = self._pending.get(film_id)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._pending[film_id] = future
+        if not owner:
+            metrics.count('runtime_cache.coalesced')
+            return future.result()
+        metrics.count('runtime_cache.misses')
+        try:
+            runtime = fetch(film_id)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(film_id, runtime)
+            future.set_result(runtime)
+            return runtime
+        finally:
+            with self._lock:
+                self._pending.pop(film_id, None)
+
+    def flush(self):
+        with self._lock:
+            rows = [(film_id, runtime, fetched_at) for film_id, (runtime, fetched_at) in self._dirty.items()]
+            self._dirty = {}
+            if rows:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO runtimes (film_id, runtime, fetched_at) VALUES (?, ?, ?)", rows
+                )
+                self._connection.commit()
+        return len(rows)
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_runtime_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = RuntimeCache()
+        return _default_cache
@@ -0,0 +1,101 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TOKEN_PATH = 'cache/token.json'
+EXPIRY_MARGIN = 60
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager:
+    def __init__(self, fetch, path=TOKEN_PATH, key='default', margin=EXPIRY_MARGIN):
+        self.fetch = fetch
+        self.path = path
+        self.key = key
+        self.margin = margin
+        self.issued = set()
+        self._access_token = None
+        self._expires_at = None
+        self._lock = threading.Lock()
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _is_fresh(self, expires_at):
+        return expires_at is None or time.time() < expires_at - self.margin
+
+    def cached(self):
+        access_token, expires_at = self._access_token, self._expires_at
+        if access_token is not None and self._is_fresh(expires_at):
+            return access_token
+        return None
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        if not self.path or fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+
+    def _write(self, tokens):
+        temporary_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            json.dump(tokens, f)
+        os.replace(temporary_path, self.path)
+
+    def _remember(self, access_token, expires_at):
+        self._access_token = access_token
+        self._expires_at = expires_at
+        self.issued.add(access_token)
+        return access_token
+
+    def _acquire(self, stale_token=None):
+        with self._file_lock():
+            tokens = self._read()
+            stored = tokens.get(self.key)
+            if stored and stored['access_token'] != stale_token and self._is_fresh(stored['expires_at']):
+                return self._remember(stored['access_token'], stored['expires_at'])
+
+            response_data = self.fetch()
+            expires_in = response_data.get('expires_in')
+            expires_at = time.time() + expires_in if expires_in else None
+            if self.path:
+                tokens[self.key] = {'access_token': response_data['access_token'], 'expires_at': expires_at}
+                self._write(tokens)
+            return self._remember(response_data['access_token'], expires_at)
+
+    def token(self):
+        access_token = self.cached()
+        if access_token is not None:
+            return access_token
+        with self._lock:
+            return self.cached() or self._acquire()
+
+    def refresh(self, stale_token):
+        with self._lock:
+            if self._access_token != stale_token and self.cached():
+                return self._access_token
+            logger.info("Access token was rejected, requesting a new one...")
+            return self._acquire(stale_token)
@@ -0,0 +1,68 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SNAPSHOT_PATH = 'cache/snapshots.sqlite3'
+
+
+def new_snapshot(year):
+    return {
+        'year': year,
+        'films': [],
+        'log_entries': [],
+        'watch_minutes': 0,
+        'year_minutes': 0,
+        'synced_at': None
+    }
+
+
+class SnapshotStore:
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots (user_id TEXT PRIMARY KEY, data TEXT NOT NULL, synced_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def load(self, user_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM snapshots WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def save(self, user_id, snapshot):
+        snapshot['synced_at'] = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO snapshots (user_id, data, synced_at) VALUES (?, ?, ?)",
+                (user_id, json.dumps(snapshot), snapshot['synced_at'])
+            )
+            self._connection.commit()
+
+    def delete(self, user_id):
+        with self._lock:
+            self._connection.execute("DELETE FROM snapshots WHERE user_id = ?", (user_id,))
+            self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_snapshot_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SnapshotStore()
+        return _default_store